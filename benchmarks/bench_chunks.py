@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Write and read a trajectory with each chunk layout of pyh5md.element and
+display the throughput of writes, frame reads and particle time-series reads.
+"""
+from __future__ import print_function, division
+
+import argparse
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--particles', type=int, default=10000)
+parser.add_argument('--frames', type=int, default=200)
+parser.add_argument('--series', type=int, default=16, help='number of particles in a time series read')
+parser.add_argument('--chunk-bytes', type=int, default=None)
+parser.add_argument('--file', type=str, default='bench_chunks.h5')
+args = parser.parse_args()
+
+import os
+import time
+import numpy as np
+from pyh5md import File, element
+from pyh5md.h5md_module import chunk_shape
+
+N = args.particles
+r = np.random.random((N, 3))
+mb = r.nbytes*args.frames/1024**2
+
+print('%-8s %-20s %12s %12s %12s' % ('layout', 'chunks', 'write MB/s', 'frames MB/s', 'series MB/s'))
+for layout in ['default', 'auto', 'frames', 'series']:
+    if layout=='default':
+        kwargs = {}
+    else:
+        # fill whole chunks along time when the layout spans many frames
+        buffer_frames = chunk_shape((0,)+r.shape, r.dtype, layout, args.chunk_bytes)[0]
+        kwargs = {'chunks': layout, 'chunk_bytes': args.chunk_bytes, 'buffer_frames': buffer_frames}
+
+    start = time.perf_counter()
+    with File(args.file, 'w', creator='bench_chunks.py') as f:
+        g = f.particles_group('atoms')
+        pos = element(g, 'position', store='time', shape=r.shape, dtype=r.dtype, time=True, **kwargs)
+        chunks = pos.value.chunks
+        for i in range(args.frames):
+            pos.append(r, i, 0.1*i)
+    write = time.perf_counter() - start
+
+    with File(args.file, 'r') as f:
+        pos = element(f.particles_group('atoms'), 'position')
+        start = time.perf_counter()
+        for i in range(args.frames):
+            pos.value[i]
+        frames = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(0, N, N//args.series):
+            pos.value[:, i]
+        series = time.perf_counter() - start
+
+    series_mb = mb*len(range(0, N, N//args.series))/N
+    print('%-8s %-20s %12.1f %12.1f %12.1f' % (layout, chunks, mb/write, mb/frames, series_mb/series))
+
+os.remove(args.file)
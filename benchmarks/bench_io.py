@@ -0,0 +1,161 @@
+"""
+Write and read throughput of pyh5md, measured with pytest-benchmark.
+
+Run with
+
+    pytest benchmarks/bench_io.py --benchmark-json=bench_io.json
+
+The json file holds the timings of every benchmark, with the number of bytes
+moved per round in extra_info, so that results can be compared across
+releases with pytest-benchmark compare. The MPI benchmark runs when h5py is
+built with MPI support and mpi4py is installed, and can be run on several
+ranks with mpirun -n 4 python -m pytest benchmarks/bench_io.py -k mpi.
+"""
+import os
+import numpy as np
+import h5py
+import pytest
+import pyh5md
+
+pytest.importorskip('pytest_benchmark')
+
+FRAMES = 50
+ROUNDS = 5
+
+
+@pytest.fixture
+def fname(tmpdir):
+    return str(tmpdir.join('bench.h5'))
+
+
+def run(benchmark, fname, write, nbytes, **kwargs):
+    """Benchmark write(f) on a new file, nbytes being the data written."""
+    def setup():
+        if os.path.exists(fname):
+            os.remove(fname)
+    def target():
+        with pyh5md.File(fname, 'w', creator='bench_io.py', **kwargs) as f:
+            write(f)
+    benchmark.extra_info['bytes'] = nbytes
+    benchmark.pedantic(target, setup=setup, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('N', [10, 1000, 100000])
+def test_append_time(benchmark, fname, N, dtype):
+    r = np.ones((N, 3), dtype=dtype)
+    def write(f):
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             data=r, time=True)
+        for i in range(FRAMES):
+            pos.append(r, i, 0.1*i)
+    run(benchmark, fname, write, r.nbytes*FRAMES)
+
+
+@pytest.mark.parametrize('N', [10, 1000, 100000])
+def test_append_linear(benchmark, fname, N):
+    r = np.ones((N, 3))
+    def write(f):
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='linear',
+                             data=r, step=1, time=0.1)
+        for i in range(FRAMES):
+            pos.append(r)
+    run(benchmark, fname, write, r.nbytes*FRAMES)
+
+
+@pytest.mark.parametrize('policy', ['none', 'buffer', 'growth', 'async'])
+@pytest.mark.parametrize('n_elements', [10, 200])
+def test_append_observables(benchmark, fname, n_elements, policy):
+    kwargs = {'buffer': {'buffer_frames': 64}, 'growth': {'growth': 2}}.get(policy, {})
+    def write(f):
+        obs = [pyh5md.element(f, 'observables/o%d' % i, store='time', shape=(),
+                              dtype=np.float64, time=True, **kwargs)
+               for i in range(n_elements)]
+        for i in range(FRAMES):
+            for o in obs:
+                o.append(1., i, 0.1*i)
+    file_kwargs = {'writer': 'async'} if policy=='async' else {}
+    run(benchmark, fname, write, 8*n_elements*FRAMES, **file_kwargs)
+
+
+@pytest.mark.parametrize('chunks', ['default', 'auto', 'frames', 'series'])
+def test_chunks(benchmark, fname, chunks):
+    r = np.ones((10000, 3))
+    kwargs = {} if chunks=='default' else {'chunks': chunks, 'buffer_frames': FRAMES}
+    def write(f):
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=r.shape, dtype=r.dtype, **kwargs)
+        for i in range(FRAMES):
+            pos.append(r, i)
+    run(benchmark, fname, write, r.nbytes*FRAMES)
+
+
+@pytest.mark.parametrize('compression', [None, 'fast', 'small', 'zstd', 'blosc'])
+def test_compression(benchmark, fname, compression):
+    if compression in ('zstd', 'blosc'):
+        pytest.importorskip('hdf5plugin')
+    r = np.cumsum(np.random.normal(size=(FRAMES, 10000, 3)), axis=0)
+    def write(f):
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=r.shape[1:], dtype=r.dtype, compression=compression)
+        for i in range(FRAMES):
+            pos.append(r[i], i)
+    run(benchmark, fname, write, r.nbytes)
+    benchmark.extra_info['file_size'] = os.path.getsize(fname)
+
+
+@pytest.fixture(scope='module')
+def trajectory(tmpdir_factory):
+    fname = str(tmpdir_factory.mktemp('bench').join('trajectory.h5'))
+    r = np.random.random((10000, 3))
+    with pyh5md.File(fname, 'w', creator='bench_io.py') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', data=r, time=True)
+        for i in range(200):
+            pos.append(r, i, 0.1*i)
+        for i in range(500):
+            pyh5md.element(f, 'observables/o%d' % i, store='time', data=1., time=True)
+    return fname
+
+
+@pytest.mark.parametrize('mode', ['frames', 'subset', 'subset_fancy'])
+def test_read(benchmark, trajectory, mode):
+    indices = np.sort(np.random.choice(10000, 200, replace=False))
+    with pyh5md.File(trajectory, 'r') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        if mode=='frames':
+            read = lambda: [pos.value[i] for i in range(0, 200, 10)]
+            benchmark.extra_info['bytes'] = 20*pos.value[0].nbytes
+        elif mode=='subset':
+            read = lambda: pos.read_particles(indices)
+            benchmark.extra_info['bytes'] = 200*200*3*8
+        else:
+            read = lambda: pos.value[:, indices]
+            benchmark.extra_info['bytes'] = 200*200*3*8
+        benchmark(read)
+
+
+def test_open_traversal(benchmark, trajectory):
+    def open_and_list():
+        with pyh5md.File(trajectory, 'r') as f:
+            return len(f.elements())
+    assert benchmark(open_and_list) == 501
+
+
+@pytest.mark.skipif(not h5py.get_config().mpi, reason='h5py without MPI')
+@pytest.mark.parametrize('collective', [False, True])
+def test_mpi_region(benchmark, tmpdir, collective):
+    MPI = pytest.importorskip('mpi4py.MPI')
+    comm = MPI.COMM_WORLD
+    fname = comm.bcast(str(tmpdir.join('bench_mpi.h5')))
+    N = 10000
+    r = np.ones((N, 3))
+    region = (comm.rank*N, (comm.rank+1)*N)
+    def target():
+        with pyh5md.File(fname, 'w', creator='bench_io.py', driver='mpio', comm=comm) as f:
+            pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                                 shape=(N*comm.size, 3), dtype=r.dtype)
+            for i in range(FRAMES):
+                pos.append(r, i, region=region, collective=collective)
+    benchmark.extra_info['bytes'] = r.nbytes*FRAMES*comm.size
+    benchmark.pedantic(target, rounds=ROUNDS)
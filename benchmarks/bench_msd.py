@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Compare the FFT mean-square displacement of pyh5md.analysis with the direct
+loop over lags of examples/random_walk_1d_analysis.py.
+"""
+from __future__ import print_function, division
+
+import argparse
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--particles', type=int, default=100)
+parser.add_argument('--frames', type=int, nargs='+', default=[250, 500, 1000, 2000])
+parser.add_argument('--file', type=str, default='bench_msd.h5')
+args = parser.parse_args()
+
+import os
+import time
+import numpy as np
+from pyh5md import File, element, analysis
+
+print('%8s %12s %12s %12s' % ('frames', 'loop (s)', 'fft (s)', 'max diff'))
+for T in args.frames:
+    r = np.cumsum(np.random.normal(size=(T, args.particles, 3)), axis=0)
+    with File(args.file, 'w', creator='bench_msd.py') as f:
+        pos = element(f.particles_group('atoms'), 'position', store='time', data=r[0], time=True)
+        for i in range(T):
+            pos.append(r[i], i, 0.1*i)
+
+    with File(args.file, 'r') as f:
+        pos = element(f.particles_group('atoms'), 'position')
+        start = time.perf_counter()
+        x = pos.value[:]
+        loop = np.empty((T, args.particles))
+        for n in range(T):
+            loop[n] = np.mean(np.sum(pow(x[n:] - x[:T-n], 2), axis=2), axis=0)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lags, msd, err = analysis.msd(pos)
+        fft_time = time.perf_counter() - start
+
+    print('%8d %12.3f %12.3f %12.2e' % (T, loop_time, fft_time, np.abs(msd - loop.mean(axis=1)).max()))
+
+os.remove(args.file)
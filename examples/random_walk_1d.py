@@ -23,9 +23,9 @@ r = np.zeros((30,1), dtype=np.int32)
 # Add the trajectory position data element in the trajectory group
 part_pos = element(part, 'position', store='time', shape=r.shape, dtype=r.dtype, time=True)
 
-# Create an observable
+# Create an observable, written as block statistics of 20 steps
 f.observables = f.require_group('observables')
-obs_com = element(f.observables, 'center_of_mass', shape=(), dtype=np.float64, store='time', time=True)
+obs_com = element(f.observables, 'center_of_mass', store='reduce', every=20, time=True)
 
 # Run a simulation
 step=0
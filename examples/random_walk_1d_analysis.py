@@ -9,7 +9,7 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from pyh5md import File, element
+from pyh5md import File, element, analysis
 
 # Open a H5MD file
 f = File('walk_1d.h5', 'r')
@@ -20,22 +20,12 @@ part = f.particles_group('particles')
 # Open trajectory position data element in the trajectory group
 part_pos = element(part, 'position')
 
-# Get data and time
-r = part_pos.value
-r_time = part_pos.time
-
-# Compute the time-averaged mean-square displacement,
-# drop large correlation times due to insufficient statistics
-T = r.shape[0]
-msd = np.empty((T//4, r.shape[1]))
-time = r_time[:T//4]
-for n in range(T//4):
-    # the sum over "axis=2" is over the spatial components of the positions
-    msd[n] = np.mean(np.sum(pow(r[n:] - r[:T-n], 2), axis=2), axis=0)
-
-# Compute mean and standard error of mean (particle- and component-wise)
-msd_mean = msd.mean(axis=1)
-msd_err = msd.std(axis=1) / np.sqrt(msd.shape[1] - 1)
+# Compute the time-averaged mean-square displacement with its mean and
+# standard error over the particles, drop large correlation times due to
+# insufficient statistics
+T = part_pos.value.shape[0]
+time, msd_mean, msd_err = analysis.msd(part_pos, max_lag=T//4)
+time, msd_mean, msd_err = time[1:], msd_mean[1:], msd_err[1:]
 
 # Display the MSD and its standard error
 plt.plot(time, msd_mean, 'k-', label=r'$\langle [{\bf r}(t)-{\bf r}(0)]^2\rangle$')
@@ -56,7 +46,8 @@ plt.figure()
 # Obtain and plot the center_of_mass observable
 f.observables = f.require_group('observables')
 obs_com = element(f.observables, 'center_of_mass')
-plt.plot(obs_com.time[:], obs_com.value[:], 'k-')
+mean = obs_com.records['mean']
+plt.errorbar(mean.time[:], mean.value[:], yerr=np.sqrt(obs_com.records['variance'].value[:]), fmt='k-')
 plt.xlabel(r'$t$')
 plt.ylabel(r'center of mass')
 
@@ -22,20 +22,12 @@ with File(args.file, 'r') as f:
     assert args.group in f['particles'], "group not found in particles group"
     all_particles = f.particles_group(args.group)
 
-    for loc, name in (
-        (f['observables'], 'v'),
-        (all_particles, 'mass'),
-        (all_particles['box'], 'edges'),
-        (all_particles, 'id'),
-        (all_particles, 'position'),
-        (all_particles, 'force'),
-        (all_particles, 'velocity'),
-    ):
-        if name not in loc:
-            continue
-        el = element(loc, name)
+    names = [name for name in f.elements() if name.startswith('observables/')]
+    names += [all_particles.name + '/' + name for name in all_particles.elements()]
+    for name in names:
+        el = element(f, name)
         print('---------------------------------------------------------------')
-        print('%-10s ----------------------------------------------------' % name)
+        print('%-10s ----------------------------------------------------' % name.split('/')[-1])
         print(el.element_type)
         print("shape   :", el.value.shape)
         print("step    :", el.step, el.step_offset)
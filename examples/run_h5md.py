@@ -32,10 +32,9 @@ DT = 0.1
 time = 0.
 def dump(t):
     if t%10==0:
-        at_pos.append(r, t, t*DT)
-        at_v.append(v, t, t*DT)
+        # position, velocity and box edges share the step and time datasets
+        at.append_frame(t, t*DT, position=r, velocity=v, box=edges)
         obs_com.append(r.mean(axis=0))
-        at.box.edges.append(edges, t, t*DT)
 
 dump(0)
 t = 0
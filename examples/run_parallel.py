@@ -10,7 +10,6 @@ from pyh5md import File, element
 from mpi4py import MPI
 import time
 
-N = 128*128
 DT = 0.1
 
 comm = MPI.COMM_WORLD
@@ -18,22 +17,29 @@ rank = comm.rank
 size = comm.size
 print(rank)
 
+# the ranks hold different numbers of particles
+N = 128*128 + 64*rank
+counts = comm.allgather(N)
+
 local_ids = np.empty(N, dtype=int)
 
 def assign_ids():
     global local_ids
     if rank==0:
-        data = np.arange(N*size, dtype=int)
+        data = np.arange(sum(counts), dtype=int)
         np.random.shuffle(data)
+        offsets = np.cumsum([0] + counts)
         for i in range(1, size):
-            comm.Send(data[i*N:(i+1)*N], dest=i, tag=11)
+            comm.Send(data[offsets[i]:offsets[i+1]], dest=i, tag=11)
         local_ids = data[0:N]
     else:
         comm.Recv(local_ids, source=0, tag=11)
 
-start =  time.clock()
+start =  time.perf_counter()
 with File('parallel_example_for_1.1.h5', 'w',author='Pierre', creator='run.py',
-          driver='mpio', comm=comm) as f:
+          driver='mpio', comm=comm, writer='mpi') as f:
+
+    region, total = f.mpi_region(N)
 
     f.observables = f.require_group('observables')
     f.connectivity = f.require_group('connectivity')
@@ -44,19 +50,19 @@ with File('parallel_example_for_1.1.h5', 'w',author='Pierre', creator='run.py',
     f.all.create_box(dimension=3, boundary=['periodic']*3,
                      store='time', shape=(3,), dtype=np.float64)
 
-    id_e = element(f.all, 'id', store='time', shape=(N*size,), dtype=int)
+    id_e = element(f.all, 'id', store='time', shape=(total,), dtype=int)
 
     pos = np.zeros((N, 3))
-    pos_e = element(f.all, 'position', store='time', shape=(N*size, 3), dtype=np.float64, step_from=f.all.box.edges)
+    pos_e = element(f.all, 'position', store='time', shape=(total, 3), dtype=np.float64, step_from=f.all.box.edges)
 
     vel = np.random.random(pos.shape)-0.5
-    vel_e = element(f.all, 'velocity', store='time', shape=(N*size, 3), dtype=np.float64, time=True)
+    vel_e = element(f.all, 'velocity', store='time', shape=(total, 3), dtype=np.float64, time=True)
 
     force = np.random.random(pos.shape)-0.5
-    force_e = element(f.all, 'force', store='linear', shape=(N*size, 3), dtype=np.float64, step=1, time=DT)
+    force_e = element(f.all, 'force', store='linear', shape=(total, 3), dtype=np.float64, step=1, time=DT)
 
     mass = np.ones((N,))*100.0
-    element(f.all, 'mass', store='fixed', shape=(N*size,), dtype=np.float64)
+    element(f.all, 'mass', store='fixed', shape=(total,), dtype=np.float64)
     
     record = frozenset([0, 1, 2, 10])
     for step in range(21):
@@ -68,21 +74,21 @@ with File('parallel_example_for_1.1.h5', 'w',author='Pierre', creator='run.py',
         store_ids = False
         if step in record:
             f.all.box.edges.append((1,1,1), step)
-            pos_e.append(pos, step, region=(rank*N,(rank+1)*N), collective=args.collective)
-            vel_e.append(vel, step, step*DT, region=(rank*N,(rank+1)*N), collective=args.collective)
+            f.all.append_frame(step, step*DT, region=region, collective=args.collective,
+                               position=pos, velocity=vel)
             store_ids = True
         if step%force_e.step == 0:
-            force_e.append(force, region=(rank*N,(rank+1)*N), collective=args.collective)
+            force_e.append(force, region=region, collective=args.collective)
             store_ids = True
         if step%v_e.step == 0:
             v_e.append(np.random.randint(10))
             store_ids = True
         if store_ids:
-            id_e.append(local_ids, step, region=(rank*N,(rank+1)*N), collective=args.collective)
+            id_e.append(local_ids, step, region=region, collective=args.collective)
 
     datasize = float(sum([e.value.size for e in [id_e, v_e, force_e, vel_e, pos_e]]) + mass.size) / 1024**2
 
 
-stop = time.clock()
+stop = time.perf_counter()
 if rank==0:
     print(datasize/(stop-start), 'MB/s')
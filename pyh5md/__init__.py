@@ -1,5 +1,8 @@
 from .h5md_module import (File, element, ParticlesGroup, FixedElement,
-                          TimeElement, LinearElement)
+                          TimeElement, LinearElement, FrameWriter,
+                          ReducingElement, ElementInfo, IOStats)
+from .virtual import concat
+from . import analysis
 import os.path
 
 with open(os.path.join(os.path.dirname(__file__), 'VERSION')) as f:
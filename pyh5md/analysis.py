@@ -0,0 +1,177 @@
+"""
+Time-correlation functions of H5MD elements.
+
+The functions in this module compute mean-square displacements and time
+correlation functions with the FFT (Wiener-Khinchin) algorithm, in O(T log T)
+operations for T frames. The trajectory is read in blocks of particles so that
+the memory used for a block, including the FFT buffers, is bounded by
+max_bytes. The per_particle results are kept for all the particles.
+
+The data is either a TimeElement, a LinearElement or an array. The first axis
+is time. For one-dimensional data, there is a single particle. For
+two-dimensional data, the second axis is the particle axis with scalar data.
+Otherwise, the second axis is the particle axis and the remaining axes are
+components that are summed over (the dot product for vectors).
+
+The results are averaged over the frames and the particles. All functions
+return the lag axis, the mean over the particles and its standard error, as
+computed in examples/random_walk_1d_analysis.py.
+"""
+from __future__ import division
+
+import numpy as np
+
+MAX_BYTES = 256*1024**2
+
+
+def _shape(data):
+    value = getattr(data, 'value', data)
+    n = getattr(data, '_nframes', value.shape[0])
+    return (n,) + value.shape[1:]
+
+
+def _n_frames(data, frames):
+    return len(range(*frames.indices(_shape(data)[0])))
+
+
+def _particle_blocks(data, frames, block, max_bytes):
+    """Yield the data of blocks of particles as float64 arrays (T, P, C)."""
+    value = getattr(data, 'value', data)
+    shape = _shape(data)
+    frames = slice(*frames.indices(shape[0]))
+    n_frames = _n_frames(data, frames)
+    n_particles = 1 if len(shape)==1 else shape[1]
+    n_components = int(np.prod(shape[2:]))
+    if block is None:
+        # data and correlation (16 bytes per frame), padded input, rfft,
+        # product and irfft (32 bytes per point of the FFT of 2T to 4T points)
+        n_fft = 1 << int(2*max(n_frames, 1)-1).bit_length()
+        per_particle = (16*max(n_frames, 1) + 32*n_fft)*n_components
+        block = max(int(max_bytes)//per_particle, 1)
+    for start in range(0, n_particles, block):
+        stop = min(start+block, n_particles)
+        if len(shape)==1:
+            x = value[frames]
+        else:
+            x = value[frames, start:stop]
+        yield np.asarray(x, dtype=np.float64).reshape((n_frames, stop-start, n_components))
+
+
+def _correlate(a, b=None):
+    """Return sum_t a(t).b(t+m) / (T-m) for each particle, for all lags m."""
+    T = a.shape[0]
+    n = 1 << int(2*T-1).bit_length()
+    fa = np.fft.rfft(a, n=n, axis=0)
+    if b is None:
+        product = (fa.real**2 + fa.imag**2)
+    else:
+        product = np.conj(fa)*np.fft.rfft(b, n=n, axis=0)
+    result = np.fft.irfft(product, n=n, axis=0)[:T].sum(axis=2)
+    return result / (T - np.arange(T)).reshape((-1, 1))
+
+
+def _msd(r):
+    """Return the mean-square displacement of each particle for all lags."""
+    T = r.shape[0]
+    D = np.square(r).sum(axis=2)
+    D = np.concatenate([D, np.zeros((1, D.shape[1]))])
+    lags = np.arange(T)
+    # S1[m] = sum_{t=0}^{T-m-1} r(t)^2 + r(t+m)^2, by removing the end terms
+    removed = np.cumsum(D[lags-1] + D[T-lags], axis=0)
+    S1 = (2*D.sum(axis=0) - removed) / (T-lags).reshape((-1, 1))
+    return S1 - 2*_correlate(r)
+
+
+class _Statistics(object):
+    """Mean and variance over particles, combined block by block."""
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+    def add(self, x):
+        n = x.shape[1]
+        mean = x.mean(axis=1)
+        m2 = np.square(x - mean.reshape((-1, 1))).sum(axis=1)
+        delta = mean - self.mean
+        total = self.n + n
+        self.m2 = self.m2 + m2 + delta**2*self.n*n/total
+        self.mean = self.mean + delta*n/total
+        self.n = total
+    def result(self):
+        if self.n<2:
+            return self.mean, np.full_like(self.mean, np.nan)
+        std = np.sqrt(self.m2/self.n)
+        return self.mean, std/np.sqrt(self.n-1)
+
+
+def _lags(data, frames, max_lag, use_time):
+    n_frames = _n_frames(data, frames)
+    n_lags = n_frames if max_lag is None else min(max_lag, n_frames)
+    frame_lags = np.arange(n_lags)*(frames.step or 1)
+    if not hasattr(data, 'element_type'):
+        return n_lags, frame_lags
+    use_time = use_time and data.time is not None
+    if data.element_type=='LinearElement':
+        return n_lags, frame_lags*(data.time if use_time else data.step)
+    start = frames.indices(_shape(data)[0])[0]
+    axis = data.time if use_time else data.step
+    values = axis[start:start+frame_lags[-1]+1:frames.step or 1] if n_lags>0 else axis[:0]
+    return n_lags, values - values[:1]
+
+
+def _run(function, data, other, frames, max_lag, block, max_bytes, use_time, per_particle):
+    # the number of frames includes those held in memory
+    for x in (data, other):
+        if hasattr(x, '_sync'):
+            x._sync()
+    n_lags, lags = _lags(data, frames, max_lag, use_time)
+    stats = _Statistics()
+    blocks = []
+    b_blocks = None if other is None else _particle_blocks(other, frames, block, max_bytes)
+    for x in _particle_blocks(data, frames, block, max_bytes):
+        y = None if b_blocks is None else next(b_blocks)
+        result = function(x, y)[:n_lags]
+        stats.add(result)
+        if per_particle:
+            blocks.append(result)
+    mean, error = stats.result()
+    if per_particle:
+        return lags, mean, error, np.concatenate(blocks, axis=1)
+    return lags, mean, error
+
+
+def msd(data, frames=slice(None), max_lag=None, block=None, max_bytes=MAX_BYTES,
+        use_time=True, per_particle=False):
+    """Return the mean-square displacement of the positions in data.
+
+    frames selects the frames that are used (with a regular spacing in
+    time). max_lag is the number of lags to compute, all of them by default.
+    block is the number of particles processed at once, chosen to fit in
+    max_bytes by default. The lag axis is read from the time dataset of data,
+    or from its step dataset when use_time is False or when there is no time.
+
+    Return lags, mean and error, the mean over the particles and its standard
+    error, and the (lags, particles) MSD array when per_particle is True.
+    """
+    return _run(lambda x, y: _msd(x), data, None, frames, max_lag, block,
+                max_bytes, use_time, per_particle)
+
+
+def time_correlation(data, other=None, frames=slice(None), max_lag=None,
+                     block=None, max_bytes=MAX_BYTES, use_time=True,
+                     per_particle=False):
+    """Return the time correlation <a(0).b(t)> of data and other.
+
+    The autocorrelation of data is computed when other is None. The
+    arguments and the result are those of msd.
+    """
+    return _run(_correlate, data, other, frames, max_lag, block, max_bytes,
+                use_time, per_particle)
+
+
+def vacf(data, **kwargs):
+    """Return the velocity autocorrelation function <v(0).v(t)>.
+
+    The arguments and the result are those of msd.
+    """
+    return time_correlation(data, None, **kwargs)
@@ -1,12 +1,517 @@
+import posixpath
+import queue
+import threading
+import time as _time
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import h5py
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
 
 CHUNK_0_MAX=32
 CHUNK_1_MAX=128
+CHUNK_BYTES=512*1024
+CHUNK_SERIES_FRAMES=1024
+CHUNK_CACHE_MAX=64*1024**2
+READ_BYTES=16*1024**2
+READ_RUN_CHUNKS=8
+CHUNK_LAYOUTS = ('auto', 'frames', 'series')
+COMPRESSION_PRESETS = ('fast', 'small', 'zstd', 'blosc')
+_FILTER_KEYS = ('compression', 'compression_opts', 'shuffle', 'fletcher32')
+
+# pyh5md File objects by HDF5 file id, so that elements can find the File
+# that must flush them on close.
+_open_files = weakref.WeakValueDictionary()
+
+def _h5md_file(loc):
+    """Return the open pyh5md File containing loc, or None."""
+    return _open_files.get(loc.file.id)
+
+_POLICY_KEYS = ('buffer_frames', 'buffer_bytes', 'growth', 'expected_frames')
+
+def _pop_policy(loc, kwargs):
+    """Remove the write policy arguments from kwargs and return them."""
+    policy = dict((k, kwargs.pop(k)) for k in _POLICY_KEYS if k in kwargs)
+    f = _h5md_file(loc)
+    if f is not None and f._swmr_write and ('growth' in policy or 'expected_frames' in policy):
+        raise ValueError("growth cannot be used with SWMR, readers would see the reserved frames")
+    if f is not None and f._comm is not None and \
+       'growth' not in policy and 'expected_frames' not in policy:
+        # resizes are collective, preallocate to make them rare
+        policy['growth'] = 2.
+    return policy
+
+class FrameBuffer(object):
+    """In-memory staging array for the frames of a time-dependent element.
+
+    The buffer holds at most `frames` frames and at most `nbytes` bytes of
+    value data (at least one frame). Frames are written to the file as a
+    single block when the buffer is full, on flush() and on File.close().
+    """
+    def __init__(self, frames=None, nbytes=None):
+        if frames is None and nbytes is None:
+            raise ValueError("FrameBuffer requires frames or nbytes")
+        self.frames = frames
+        self.nbytes = nbytes
+        self.value = None
+        self.step = None
+        self.time = None
+        self.count = None
+        self.region = None
+        self.collective = False
+        self.n = 0
+    def start(self, shape, dtype, region=None, collective=False):
+        size = self.frames
+        if self.nbytes is not None:
+            frame_nbytes = max(int(np.prod(shape))*np.dtype(dtype).itemsize, 1)
+            by_bytes = max(int(self.nbytes)//frame_nbytes, 1)
+            size = by_bytes if size is None else min(size, by_bytes)
+        size = max(int(size), 1)
+        if self.value is None or self.value.shape!=(size,)+tuple(shape) or self.value.dtype!=dtype:
+            self.value = np.empty((size,)+tuple(shape), dtype=dtype)
+            self.step = np.empty((size,), dtype=int)
+            self.time = np.empty((size,), dtype=float)
+            self.count = np.empty((size,), dtype=int)
+        self.region = region
+        self.collective = collective
+        self.n = 0
+    def push(self, v, step=None, time=None, count=None):
+        """Stage one frame. Return True when the buffer is full."""
+        self.value[self.n] = v
+        if step is not None:
+            self.step[self.n] = step
+        self.time[self.n] = np.nan if time is None else time
+        if count is not None:
+            self.count[self.n] = count
+        self.n += 1
+        return self.n==self.value.shape[0]
+
+class AsyncWriter(object):
+    """Background thread writing the frames appended to the elements of a File.
+
+    append copies the frame into a queue of at most queue_size frames and
+    returns; it blocks while the queue is full. The thread writes the queued
+    frames of an element as one block. An error in the thread is raised by
+    the next append or flush.
+    """
+    def __init__(self, queue_size=64):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch = max(int(queue_size), 1)
+        self.error = None
+        self.reported = False
+        self.thread = threading.Thread(target=self._run, name='pyh5md-writer')
+        self.thread.daemon = True
+        self.thread.start()
+    def put(self, e, v, step, time, region=None, collective=False, count=None):
+        self.check()
+        if region is not None:
+            region = tuple(region)
+        self.queue.put((e, np.array(v, dtype=e.value.dtype), step, time, region, collective, count))
+    def check(self):
+        if self.error is not None:
+            self.reported = True
+            raise RuntimeError("asynchronous write failed: %s" % (self.error,)) from self.error
+    def drain(self):
+        """Wait until all queued frames are written."""
+        self.queue.join()
+        self.check()
+    def close(self):
+        """Write the queued frames and stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            while len(items)<self.batch:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            try:
+                if self.error is None:
+                    self._write([item for item in items if item is not None])
+            except Exception as exc:
+                self.error = exc
+            finally:
+                for item in items:
+                    self.queue.task_done()
+            if stop:
+                return
+    def _write(self, items):
+        # consecutive frames of an element with the same region form a run
+        runs = {}
+        for item in items:
+            key = id(item[0])
+            run = runs.get(key)
+            if run is not None and run[-1][4:6]!=item[4:6]:
+                self._write_run(run)
+                run = None
+            if run is None:
+                run = runs[key] = []
+            run.append(item)
+        for run in runs.values():
+            self._write_run(run)
+    def _write_run(self, run):
+        e, v, step, time, region, collective, count = run[0]
+        if len(run)==1 or e._buffer is not None:
+            for item in run:
+                e._store(*item[1:])
+            return
+        v = np.stack([item[1] for item in run])
+        steps = np.array([item[2] for item in run])
+        times = np.array([np.nan if item[3] is None else item[3] for item in run], dtype=float)
+        counts = None if count is None else np.array([item[6] for item in run])
+        e._write_frames(v, steps, times, len(run), region, collective, counts)
+
+class IOStats(object):
+    """Counts, cumulative time and bytes of the I/O operations of elements.
+
+    The operations are 'append', 'write' and 'write_collective' (value, step
+    and time data), 'resize', 'read' and 'flush'. hook, when given, is called
+    as hook(name, operation, seconds, nbytes) after every operation.
+    """
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.records = {}
+        # the async writer records from its own thread
+        self.lock = threading.Lock()
+    def add(self, name, operation, seconds, nbytes=0):
+        with self.lock:
+            r = self.records.get((name, operation))
+            if r is None:
+                r = self.records[(name, operation)] = [0, 0., 0]
+            r[0] += 1
+            r[1] += seconds
+            r[2] += nbytes
+        if self.hook is not None:
+            self.hook(name, operation, seconds, nbytes)
+    def result(self, reset=False):
+        with self.lock:
+            records = sorted(self.records.items())
+            if reset:
+                self.records = {}
+        return [{'element': name, 'operation': op, 'count': r[0], 'seconds': r[1], 'bytes': r[2]}
+                for (name, op), r in records]
+
+def _memmap(dset, n=None):
+    """Return a read-only numpy.memmap of dset, or None when it is not possible.
+
+    The data must be stored in one uncompressed block (contiguous layout, or
+    a single chunk spanning the dataset) of a file opened with the default
+    sec2 driver. n limits the first dimension. A file open for writing is
+    flushed first, so that the data and its allocation are on disk.
+    """
+    if dset.file.driver not in ('sec2', 'stdio') or dset.is_virtual:
+        return None
+    if dset.dtype.hasobject or dset.shape==():
+        return None
+    dcpl = dset.id.get_create_plist()
+    if dcpl.get_nfilters()>0 or dcpl.get_external_count()>0:
+        return None
+    layout = dcpl.get_layout()
+    if layout==h5py.h5d.CONTIGUOUS:
+        offset = dset.id.get_offset()
+    elif layout==h5py.h5d.CHUNKED and dset.chunks==dset.shape and dset.id.get_num_chunks()==1:
+        offset = dset.id.get_chunk_info(0).byte_offset
+    else:
+        return None
+    if offset is None:
+        return None
+    shape = dset.shape
+    if n is not None and len(shape)>0:
+        shape = (min(n, shape[0]),) + shape[1:]
+    if 0 in shape:
+        return np.empty(shape, dtype=dset.dtype)
+    if dset.file.mode=='r+':
+        dset.file.flush()
+    return np.memmap(dset.file.filename, mode='r', dtype=dset.dtype, shape=shape, offset=offset)
+
+def _data_dims(dims, ndim):
+    """Return ndim dimension names, particle and component by default."""
+    if dims is None:
+        dims = ('particle', 'component') + tuple('dim_%d' % i for i in range(3, ndim+1))
+    return tuple(dims)[:ndim]
 
 class Element(object):
+    _buffer = None
+    _growth = None
+    _expected_frames = None
+    _writer = None
+    _step_from = None
+    _index_cache = None
+    _file_ref = None
+    _stats = None
+    _index_writer = True
+    count = None
     def append(self, *args, **kwargs):
         raise NotImplementedError
+    def _record(self, operation, t0, nbytes=0):
+        self._stats.add(self._stats_name, operation, _time.perf_counter()-t0, nbytes)
+    def as_memmap(self):
+        """Return the value as a read-only numpy.memmap of the file.
+
+        The operating system shares the pages of the memmap among processes.
+        When the layout of the data does not allow it (compression, several
+        chunks, in-memory driver), the value is read into an array instead.
+        """
+        self._sync()
+        result = _memmap(self.value, self._nframes)
+        if result is None:
+            result = self.value[:self._nframes]
+        return result
+    def to_dask(self, block=None):
+        """Return the value as a lazy dask array. Requires dask.
+
+        The blocks of the array are made of whole chunks of the value
+        dataset, so that they are read without overlap: one chunk along the
+        particle and other axes, and block frames rounded up to a multiple of
+        the chunk size along time (one chunk by default).
+        """
+        try:
+            import dask.array as da
+        except ImportError:
+            raise ImportError("to_dask requires the dask package")
+        self._sync()
+        chunks = self.value.chunks
+        if chunks is None:
+            chunks = chunk_shape(self.value.shape, self.value.dtype, 'frames')
+        chunks = (max(-(-(block or chunks[0])//chunks[0]), 1)*chunks[0],) + chunks[1:]
+        return da.from_array(self.value, chunks=chunks)[:self._nframes]
+    def _steps_times(self):
+        """Return the step and time (or None) of the frames."""
+        raise NotImplementedError
+    def to_xarray(self, block=None, dims=None):
+        """Return the value as a lazy xarray.DataArray. Requires xarray and dask.
+
+        The data is that of to_dask. The first dimension is step, with the
+        step of the frames and their time as coordinates. dims names the
+        other dimensions, particle and component by default.
+        """
+        try:
+            import xarray
+        except ImportError:
+            raise ImportError("to_xarray requires the xarray package")
+        data = self.to_dask(block)
+        dims = ('step',) + _data_dims(dims, data.ndim-1)
+        step, time = self._steps_times()
+        coords = {'step': step}
+        if time is not None:
+            coords['time'] = ('step', time)
+        return xarray.DataArray(data, dims=dims, coords=coords,
+                                name=posixpath.basename(self.name))
+    def get_by_step(self, step):
+        """Return the value of the frame at step."""
+        return self.get_by_idx(self._idx_by_step(step))
+    def get_by_time(self, time):
+        """Return the value of the frame whose time is closest to time."""
+        return self.get_by_idx(self._idx_by_time(time))
+    def slice_steps(self, start, stop):
+        """Return the values of the frames with start <= step < stop."""
+        return self.get_by_idx(slice(*self._idx_range('step', start, stop)))
+    def slice_times(self, start, stop):
+        """Return the values of the frames with start <= time < stop."""
+        return self.get_by_idx(slice(*self._idx_range('time', start, stop)))
+    def _sync(self):
+        """Write the frames held in memory, without trimming the datasets."""
+        if self._step_from is not None:
+            self._step_from._sync()
+        if self._writer is not None:
+            self._writer.drain()
+        if self._buffer is not None:
+            self._write_buffer()
+    def flush(self):
+        """Write the buffered frames and trim the datasets to their length."""
+        t0 = None if self._stats is None else _time.perf_counter()
+        if self._writer is not None:
+            self._writer.drain()
+        if self._buffer is not None:
+            self._write_buffer()
+        if self._growth is not None:
+            n = self._nframes
+            for dset in [self.value] + [d for d, _ in self._index_data(None, None)]:
+                if dset.shape[0]!=n:
+                    self._resize(dset, n)
+        if t0 is not None:
+            self._record('flush', t0)
+    def _set_policy(self, buffer_frames=None, buffer_bytes=None,
+                    growth=None, expected_frames=None):
+        self._policy = (buffer_frames, buffer_bytes, growth, expected_frames)
+        if growth is None and expected_frames is not None:
+            growth = 2.
+        if growth is not None and growth<=1:
+            raise ValueError("growth must be larger than 1")
+        self._growth = growth
+        self._expected_frames = expected_frames
+        self._buffer = None
+        if buffer_frames is not None or buffer_bytes is not None:
+            self._buffer = FrameBuffer(buffer_frames, buffer_bytes)
+    def _reuse(self, loc, kwargs):
+        """Apply the write policies given when the element is requested again.
+
+        The frames written with the previous policies are flushed first.
+        """
+        if not any(k in kwargs for k in _POLICY_KEYS):
+            return
+        policy = _pop_policy(loc, kwargs)
+        if tuple(policy.get(k) for k in _POLICY_KEYS)==self._policy:
+            return
+        self.flush()
+        self._set_policy(**policy)
+        f = _h5md_file(loc)
+        if f is not None and (self._buffer is not None or self._growth is not None) \
+           and self not in f._elements:
+            f._elements.append(self)
+    def _setup_policy(self, loc, **policy):
+        self._nframes = self.value.shape[0]
+        self._set_policy(**policy)
+        f = _h5md_file(loc)
+        if f is not None:
+            self._writer = f._writer
+            if f._stats is not None:
+                self._stats = f._stats
+                self._stats_name = self.name
+            if f._comm is not None:
+                self._index_writer = f._comm.rank==0
+            if f._element_chunk_cache and self.value.chunks is not None:
+                cache = chunk_cache(self.value.shape, self.value.chunks, self.value.dtype)
+                path = self.value.name
+                # HDF5 sets the chunk cache when the dataset is first opened
+                self.value = None
+                self.value = _open_with_cache(f, path, cache)
+            if f._flush_interval is not None:
+                self._file_ref = weakref.ref(f)
+            if self._buffer is not None or self._growth is not None or self._writer is not None:
+                f._elements.append(self)
+    def _index_data(self, step, time, count=None):
+        """Return the (dataset, data) pairs written alongside value."""
+        return []
+    def _reserve(self, dset, n):
+        """Make sure that dset has room for n frames."""
+        capacity = dset.shape[0]
+        if n<=capacity:
+            return
+        if self._growth is not None:
+            n = max(n, int(np.ceil(capacity*self._growth)), self._expected_frames or 0)
+        self._resize(dset, n)
+    def _resize(self, dset, n, axis=0):
+        t0 = None if self._stats is None else _time.perf_counter()
+        dset.resize(n, axis=axis)
+        if t0 is not None:
+            self._record('resize', t0)
+    def _frame_shape(self, region=None):
+        if region is None:
+            return self.value.shape[1:]
+        return (region[1]-region[0],) + self.value.shape[2:]
+    def _write_value(self, idx, v, region=None, collective=False):
+        t0 = None if self._stats is None else _time.perf_counter()
+        if region is not None:
+            if collective:
+                with self.value.collective:
+                    self.value[idx,region[0]:region[1],...] = v
+            else:
+                self.value[idx,region[0]:region[1],...] = v
+        else:
+            self.value[idx] = v
+        if t0 is not None:
+            self._record('write_collective' if collective else 'write', t0,
+                         np.size(v)*self.value.dtype.itemsize)
+    def _write_index(self, dset, idx, data):
+        if not self._index_writer:
+            return
+        t0 = None if self._stats is None else _time.perf_counter()
+        dset[idx] = data
+        if t0 is not None:
+            self._record('write', t0, np.size(data)*dset.dtype.itemsize)
+    def _write_frames(self, v, step, time, k=None, region=None, collective=False, count=None):
+        """Write a single frame, or a block of k frames, after the last frame."""
+        n = self._nframes
+        idx = n if k is None else slice(n, n+k)
+        n_new = n+1 if k is None else n+k
+        self._reserve(self.value, n_new)
+        self._write_value(idx, v, region, collective)
+        for dset, data in self._index_data(step, time, count):
+            self._reserve(dset, n_new)
+            self._write_index(dset, idx, data)
+        self._nframes = n_new
+    def _append(self, v, step, time, region=None, collective=False, count=None):
+        t0 = None if self._stats is None else _time.perf_counter()
+        if self._writer is not None:
+            self._writer.put(self, v, step, time, region, collective, count)
+        else:
+            self._store(v, step, time, region, collective, count)
+        if t0 is not None:
+            self._record('append', t0, np.size(v)*self.value.dtype.itemsize)
+        if self._file_ref is not None:
+            f = self._file_ref()
+            if f is not None:
+                f._auto_flush()
+    def _store(self, v, step, time, region=None, collective=False, count=None):
+        if self._buffer is not None:
+            self._buffer_frame(v, step, time, region, collective, count)
+        else:
+            self._write_frames(v, step, time, region=region, collective=collective, count=count)
+    def _buffer_frame(self, v, step, time, region, collective, count=None):
+        b = self._buffer
+        if b.n>0 and (b.region!=region or b.collective!=collective):
+            self._write_buffer()
+        if b.n==0:
+            b.start(self._frame_shape(region), self.value.dtype, region, collective)
+        if b.push(v, step, time, count):
+            self._write_buffer()
+    def _write_buffer(self):
+        b = self._buffer
+        if b.n==0:
+            return
+        k = b.n
+        count = None if self.count is None else b.count[:k]
+        self._write_frames(b.value[:k], b.step[:k], b.time[:k], k, b.region, b.collective, count)
+        b.n = 0
+    def get_by_idx(self, idx):
+        if self._stats is None:
+            return self._get_by_idx(idx)
+        t0 = _time.perf_counter()
+        result = self._get_by_idx(idx)
+        self._record('read', t0, np.asarray(result).nbytes)
+        return result
+    def _get_by_idx(self, idx):
+        if self._writer is not None:
+            self._writer.drain()
+        b = self._buffer
+        if b is not None and b.n>0 and b.region is not None:
+            # partial frames cannot be merged with the file data
+            self._write_buffer()
+        n = self._nframes
+        n_buffer = 0 if b is None else b.n
+        if n_buffer==0 and self.value.shape[0]==n:
+            return self.value[idx]
+        # resolve the frames, the other axes are applied to them
+        frames, rest = idx, ()
+        if isinstance(idx, tuple):
+            if len(idx)>0 and idx[0] is not Ellipsis:
+                frames, rest = idx[0], idx[1:]
+            else:
+                frames, rest = slice(None), idx
+        sel = np.arange(n+n_buffer)[frames]
+        if sel.ndim==0:
+            out = self.value[sel] if sel<n else b.value[sel-n].copy()
+            return out[rest] if rest else out
+        if rest and rest[0] is not Ellipsis:
+            rest = (slice(None),) + rest
+        out = np.empty((len(sel),)+self.value.shape[1:], dtype=self.value.dtype)
+        in_file = sel<n
+        if in_file.any():
+            f_idx = sel[in_file]
+            lo = f_idx.min()
+            out[in_file] = self.value[lo:f_idx.max()+1][f_idx-lo]
+        if n_buffer>0:
+            out[~in_file] = b.value[sel[~in_file]-n]
+        return out[rest] if rest else out
 
 class FixedElement(h5py.Dataset, Element):
     def __init__(self, loc, name, **kwargs):
@@ -19,13 +524,62 @@ class FixedElement(h5py.Dataset, Element):
         self.step_offset = None
         self.time = None
         self.time_offset = None
+        f = _h5md_file(loc)
+        if f is not None and f._stats is not None:
+            self._stats = f._stats
+            self._stats_name = self.name
+    def __getitem__(self, args, **kwargs):
+        if self._stats is None:
+            return super(FixedElement, self).__getitem__(args, **kwargs)
+        t0 = _time.perf_counter()
+        result = super(FixedElement, self).__getitem__(args, **kwargs)
+        self._record('read', t0, np.asarray(result).nbytes)
+        return result
     def append(self, v, step=None, time=None):
         pass
     def get_by_idx(self, idx):
         return self
+    def get_by_step(self, step):
+        return self
+    def get_by_time(self, time):
+        return self
+    def slice_steps(self, start, stop):
+        return self
+    def slice_times(self, start, stop):
+        return self
+    def as_memmap(self):
+        """Return the value as a read-only numpy.memmap of the file.
+
+        See Element.as_memmap. Elements created with contiguous=True qualify.
+        """
+        result = _memmap(self)
+        if result is None:
+            result = self[()]
+        return result
     @property
     def value(self):
         return h5py.Dataset(self._id)
+    def _reuse(self, loc, kwargs):
+        pass
+    def to_dask(self):
+        """Return the data as a lazy dask array of whole chunks. Requires dask."""
+        try:
+            import dask.array as da
+        except ImportError:
+            raise ImportError("to_dask requires the dask package")
+        return da.from_array(self.value, chunks=self.chunks or 'auto')
+    def to_xarray(self, dims=None):
+        """Return the data as a lazy xarray.DataArray. Requires xarray and dask.
+
+        dims names the dimensions, particle and component by default.
+        """
+        try:
+            import xarray
+        except ImportError:
+            raise ImportError("to_xarray requires the xarray package")
+        data = self.to_dask()
+        return xarray.DataArray(data, dims=_data_dims(dims, data.ndim),
+                                name=posixpath.basename(self.name))
     @property
     def element_type(self):
         return 'FixedElement'
@@ -34,6 +588,7 @@ class FixedElement(h5py.Dataset, Element):
 
 class LinearElement(h5py.Group, Element):
     def __init__(self, loc, name, **kwargs):
+        policy = _pop_policy(loc, kwargs)
         is_new = name not in loc
         g = loc.require_group(name)
         if is_new:
@@ -46,10 +601,12 @@ class LinearElement(h5py.Group, Element):
             self.value = g.create_dataset('value', **kwargs)
             g.create_dataset('step', data=int(step))
             self.step = int(step)
+            self.step_offset = None
             if step_offset is not None:
                 g['step'].attrs['offset'] = int(step_offset)
                 self.step_offset = int(step_offset)
-            self.step_offset = None
+            self.time = None
+            self.time_offset = None
             if time is not None:
                 g.create_dataset('time', data=time)
                 self.time = time
@@ -57,63 +614,97 @@ class LinearElement(h5py.Group, Element):
                     g['time'].attrs['offset'] = time_offset
                 self.time_offset = time_offset
         else:
-            self.step = g['step'][()]
-            if 'offset' in self['step'].attrs:
-                self.step_offset = self['step'].attrs['offset']
-            else:
-                self.step_offset = None
+            # same types as at creation
+            self.step = int(g['step'][()])
+            offset = _offset(g['step'])
+            self.step_offset = None if offset is None else int(offset)
             self.value = self['value']
             if 'time' in self:
                 self.time = self['time'][()]
-                if 'offset' in self['time'].attrs:
-                    self.time_offset = self['time'].attrs['offset']
-                else:
-                    self.time_offset = None
+                self.time_offset = _offset(self['time'])
             else:
                 self.time = None
                 self.time_offset = None
+        self._setup_policy(loc, **policy)
     @property
     def element_type(self):
         return 'LinearElement'
     def append(self, v, step=None, time=None, region=None, collective=False):
-        self.value.resize(self.value.shape[0]+1, axis=0)
-        if region is not None:
-            if collective:
-                with self.value.collective:
-                    self.value[-1,region[0]:region[1],...] = v
-            else:
-                self.value[-1,region[0]:region[1],...] = v
+        self._append(v, None, None, region, collective)
+    def _steps_times(self):
+        frames = np.arange(self._nframes)
+        step = (self.step_offset or 0) + frames*self.step
+        time = None if self.time is None else (self.time_offset or 0) + frames*self.time
+        return step, time
+    def _linear_index(self, name, x, rounding):
+        # frame i is at offset + i*increment
+        if name=='step':
+            increment, offset = self.step, self.step_offset
         else:
-            self.value[-1] = v
-    def get_by_idx(self, idx):
-        return self['value'][idx]
+            if self.time is None:
+                raise ValueError("element has no time")
+            increment, offset = self.time, self.time_offset
+        return rounding((x - (offset or 0))/increment)
+    def _idx_by_step(self, step):
+        self._sync()
+        offset = self.step_offset or 0
+        i = (step - offset)//self.step
+        if offset + i*self.step!=step or not 0<=i<self._nframes:
+            raise KeyError("step %d not found" % step)
+        return int(i)
+    def _idx_by_time(self, time):
+        self._sync()
+        if self._nframes==0:
+            raise KeyError("element has no frames")
+        i = self._linear_index('time', time, np.round)
+        return int(min(max(i, 0), self._nframes-1))
+    def _idx_range(self, name, start, stop):
+        self._sync()
+        bounds = [self._linear_index(name, x, np.ceil) for x in (start, stop)]
+        return tuple(int(min(max(i, 0), self._nframes)) for i in bounds)
     def __repr__(self):
         return 'H5MD LinearElement'
 
 class TimeElement(h5py.Group, Element):
     def __init__(self, loc, name, **kwargs):
+        policy = _pop_policy(loc, kwargs)
         is_new = name not in loc
         g = loc.require_group(name)
         if is_new:
+            # step and time are compressed like value
+            filters = dict((k, kwargs[k]) for k in _FILTER_KEYS if k in kwargs)
             step_from = kwargs.pop('step_from', None)
+            variable = kwargs.pop('variable', False)
+            self.step_offset = None
+            self.time_offset = None
             if step_from is not None:
                 g['step'] = step_from.step
                 self.step = step_from.step
                 self.own_step = False
+                self._step_from = step_from
             else:
-                self.step = g.create_dataset('step', dtype=int, shape=(0,), maxshape=(None,))
+                self.step = g.create_dataset('step', dtype=int, shape=(0,), maxshape=(None,),
+                                             **filters)
                 self.own_step = True
             time = kwargs.pop('time', None)
             if time is not None:
                 if self.own_step:
                     if time==True:
-                        self.time = g.create_dataset('time', dtype=float, shape=(0,), maxshape=(None,))
+                        self.time = g.create_dataset('time', dtype=float, shape=(0,),
+                                                     maxshape=(None,), **filters)
                     else:
                         raise ValueError("Time must be True or None for TimeElement")
                 else:
                     g['time'] = self.time = step_from.time
             else:
                 self.time = None
+            self.count = None
+            if variable:
+                if 'fillvalue' not in kwargs:
+                    kind = np.dtype(kwargs.get('dtype', 'f')).kind
+                    kwargs['fillvalue'] = np.nan if kind=='f' else -1
+                self.count = g.create_dataset('count', dtype=int, shape=(0,), maxshape=(None,),
+                                              **filters)
             self.value = g.create_dataset('value', **kwargs)
         else:
             self.step = g['step']
@@ -130,32 +721,486 @@ class TimeElement(h5py.Group, Element):
             else:
                 self.time = None
                 self.time_offset = None
+            self.count = g['count'] if 'count' in g else None
             self.value = g['value']
+            self.own_step = True
+            if h5py.h5o.get_info(g['step'].id).rc>1:
+                # a shared step dataset is written by the first element listed
+                # with it, as if the others were created with step_from
+                f = _h5md_file(loc)
+                name = g.name.lstrip('/')
+                elements = _catalogue(loc.file) if f is None else f.elements()
+                owner = posixpath.dirname(elements[name].step)
+                if owner!=name:
+                    self.own_step = False
+                    if f is not None:
+                        self._step_from = element(f, owner)
         super(TimeElement, self).__init__(g._id)
+        self._setup_policy(loc, **policy)
     def append(self, v, step, time=None, region=None, collective=False):
-        self.value.resize(self.value.shape[0]+1, axis=0)
-        if region is not None:
-            if collective:
-                with self.value.collective:
-                    self.value[-1,region[0]:region[1],...] = v
-            else:
-                self.value[-1,region[0]:region[1],...] = v
+        if self.count is not None:
+            if region is not None:
+                raise ValueError("variable elements cannot be written by region")
+            count = len(v)
+            v = self._pad(v)
+        else:
+            count = None
+        self._append(v, step, time, region, collective, count)
+    def _pad(self, v):
+        """Return the frame v of a variable element padded to the capacity."""
+        v = np.asarray(v, dtype=self.value.dtype)
+        capacity = self.value.shape[1]
+        if v.shape[0]>capacity:
+            # the frames in memory have the previous capacity
+            self._sync()
+            capacity = max(v.shape[0], int(np.ceil(capacity*(self._growth or 2.))))
+            self._resize(self.value, capacity, axis=1)
+        frame = np.empty(self.value.shape[1:], dtype=self.value.dtype)
+        frame[:v.shape[0]] = v
+        frame[v.shape[0]:] = self.value.fillvalue
+        return frame
+    def valid_particles(self, idx):
+        """Return the values of the particles present in the frames idx.
+
+        For a variable element, return the array of the count[idx] particles
+        of frame idx, or a list of such arrays when idx is a slice. The
+        frames are read in a single block.
+        """
+        if self.count is None:
+            raise ValueError("element has a fixed number of particles")
+        self._sync()
+        t0 = None if self._stats is None else _time.perf_counter()
+        if isinstance(idx, slice):
+            frames = slice(*idx.indices(self._nframes))
+            counts = self.count[frames]
+            if len(counts)==0:
+                return []
+            values = self.value[frames, :max(int(counts.max()), 1)]
+            result = [v[:c] for v, c in zip(values, counts)]
+            nbytes = values.nbytes
+        else:
+            i = range(self._nframes)[idx]
+            result = self.value[i, :max(int(self.count[i]), 1)][:self.count[i]]
+            nbytes = result.nbytes
+        if t0 is not None:
+            self._record('read', t0, nbytes)
+        return result
+    def iter_frames(self, start=None, stop=None, stride=1, block=None, prefetch=True):
+        """Iterate over the frames start:stop:stride in blocks.
+
+        Yield (step, time, value) arrays for the selected frames of
+        consecutive blocks of the value dataset. The blocks span `block`
+        frames, rounded up to a multiple of the chunk size along time (one
+        chunk by default) and begin at chunk boundaries. With prefetch, the
+        next block is read in a background thread while the current one is
+        processed. time is None when the element has no time dataset.
+        """
+        self._sync()
+        start, stop, stride = slice(start, stop, stride).indices(self._nframes)
+        if stride<1:
+            raise ValueError("stride must be positive")
+        chunk = self.value.chunks[0] if self.value.chunks else 1
+        size = max(-(-(block or chunk)//chunk), 1)*chunk
+        bounds = lambda: frame_blocks(start, stop, stride, size)
+        def read(lo, hi):
+            t0 = None if self._stats is None else _time.perf_counter()
+            sel = slice(lo, hi, stride)
+            time = None if self.time is None else self.time[sel]
+            value = self.value[sel]
+            if t0 is not None:
+                self._record('read', t0, value.nbytes)
+            return self.step[sel], time, value
+        if not prefetch:
+            for lo, hi in bounds():
+                yield read(lo, hi)
+            return
+        with ThreadPoolExecutor(1) as pool:
+            future = None
+            for lo, hi in bounds():
+                next_future = pool.submit(read, lo, hi)
+                if future is not None:
+                    yield future.result()
+                future = next_future
+            if future is not None:
+                yield future.result()
+    def read_particles(self, indices=None, frames=slice(None), ids=None, max_bytes=READ_BYTES):
+        """Return the values of a subset of particles for the frames.
+
+        Return the same array as value[frames][:, indices], for a slice of
+        frames and an array of particle indices in any order. The indices are
+        sorted and coalesced so that value is read in a few hyperslabs that
+        each span at most READ_RUN_CHUNKS consecutive chunks along the
+        particle axis. The frames are read in blocks of whole chunks along
+        time, of at most max_bytes bytes of value (at least one chunk).
+
+        With ids instead of indices, the particles are found in the id
+        element of the same group, fixed or time-dependent. A KeyError is
+        raised when an id is missing from a frame, except for variable
+        elements whose missing particles get the fill value.
+        """
+        self._sync()
+        t0 = None if self._stats is None else _time.perf_counter()
+        frames = slice(*frames.indices(self._nframes))
+        if ids is not None:
+            if indices is not None:
+                raise ValueError("give either indices or ids")
+            result = self._read_ids(np.asarray(ids), frames, max_bytes)
         else:
-            self.value[-1] = v
+            indices = np.asarray(indices, dtype=int)
+            result = self._empty_particles(frames, len(indices))
+            for rows, sel in self._particle_blocks(frames, max_bytes):
+                result[rows] = self._read_columns(sel, indices)
+        if t0 is not None:
+            self._record('read', t0, result.nbytes)
+        return result
+    def _empty_particles(self, frames, n):
+        n_frames = len(range(*frames.indices(self._nframes)))
+        return np.empty((n_frames, n) + self.value.shape[2:], dtype=self.value.dtype)
+    def _particle_blocks(self, frames, max_bytes):
+        """Yield the rows of the result and the selection of blocks of frames."""
+        start, stop, stride = frames.indices(self._nframes)
+        chunk = self.value.chunks[0] if self.value.chunks else 1
+        frame_nbytes = max(int(np.prod(self.value.shape[1:]))*self.value.dtype.itemsize, 1)
+        # frames read, stride included, in whole chunks
+        block = max(int(max_bytes)//(frame_nbytes*chunk), 1)*chunk
+        row = 0
+        for lo, hi in frame_blocks(start, stop, stride, block):
+            n = len(range(lo, hi, stride))
+            yield slice(row, row+n), slice(lo, hi, stride)
+            row += n
+    def _read_columns(self, frames, indices):
+        out = self._empty_particles(frames, len(indices))
+        if len(indices)==0 or out.shape[0]==0:
+            return out
+        indices = np.where(indices<0, indices+self.value.shape[1], indices)
+        unique, inverse = np.unique(indices, return_inverse=True)
+        chunk = self.value.chunks[1] if self.value.chunks else self.value.shape[1]
+        # runs of indices in the same or in adjacent chunks, of a bounded span
+        chunk_of = unique//chunk
+        starts = [0]
+        for k in np.flatnonzero(np.diff(chunk_of)>0) + 1:
+            if chunk_of[k]-chunk_of[k-1]>1 or chunk_of[k]-chunk_of[starts[-1]]>=READ_RUN_CHUNKS:
+                starts.append(k)
+        columns = np.empty(out.shape[:1] + (len(unique),) + out.shape[2:], dtype=out.dtype)
+        for lo, hi in zip(starts, starts[1:] + [len(unique)]):
+            a, b = unique[lo], unique[hi-1]+1
+            columns[:, lo:hi] = self.value[frames, a:b][:, unique[lo:hi]-a]
+        out[:] = columns[:, inverse.reshape(-1)]
+        return out
+    def _read_ids(self, ids, frames, max_bytes):
+        if 'id' not in self.parent:
+            raise KeyError("id element not found in %s" % self.parent.name)
+        id_element = element(self.parent, 'id')
+        variable = self.count is not None
+        result = self._empty_particles(frames, len(ids))
+        if id_element.element_type=='FixedElement':
+            slots = _find_ids(id_element[()], ids, variable)
+            for rows, sel in self._particle_blocks(frames, max_bytes):
+                result[rows] = self._read_columns(sel, np.maximum(slots, 0))
+            result[:, slots<0] = self.value.fillvalue
+            return result
+        # frames of the id element at the steps of the selected frames
+        steps = self._frame_index('step')[frames]
+        id_steps = id_element._frame_index('step')
+        id_rows = np.searchsorted(id_steps, steps)
+        if np.any(id_rows>=len(id_steps)) or \
+           np.any(id_steps[np.minimum(id_rows, len(id_steps)-1)]!=steps):
+            raise KeyError("id element has no frame for some steps")
+        slots = None
+        for rows, sel in self._particle_blocks(frames, max_bytes):
+            unique_rows, row_inverse = np.unique(id_rows[rows], return_inverse=True)
+            id_values = id_element.value[unique_rows.tolist()]
+            block_slots = np.empty((len(unique_rows), len(ids)), dtype=int)
+            for r, values in enumerate(id_values):
+                # the particles usually keep their slots from frame to frame
+                if slots is None or np.any(slots<0) or np.any(values[slots]!=ids):
+                    slots = _find_ids(values, ids, variable)
+                block_slots[r] = slots
+            block_slots = block_slots[row_inverse.reshape(-1)]
+            union, inverse = np.unique(np.maximum(block_slots, 0), return_inverse=True)
+            columns = self._read_columns(sel, union)
+            inverse = inverse.reshape(block_slots.shape)
+            block = columns[np.arange(len(block_slots)).reshape((-1, 1)), inverse]
+            block[block_slots<0] = self.value.fillvalue
+            result[rows] = block
+        return result
+    def follow(self, start=0, poll=1., timeout=None):
+        """Yield the frames written to the element by another process.
+
+        Yield (step, time, value) arrays for the frames from start on (the
+        current last frame when start is None), then poll the file every
+        poll seconds and yield the newly committed frames. Stop when no frame
+        was committed during timeout seconds, never when timeout is None.
+        The file must be opened with File(name, 'r', swmr=True) and written
+        by a File with swmr=True.
+        """
+        datasets = [d for d in (self.value, self.step, self.time) if d is not None]
+        def committed():
+            for d in datasets:
+                d.refresh()
+            self._nframes = min(d.shape[0] for d in datasets)
+            return self._nframes
+        n = committed() if start is None else start
+        last = _time.monotonic()
+        while True:
+            end = committed()
+            if end>n:
+                sel = slice(n, end)
+                yield self.step[sel], None if self.time is None else self.time[sel], self.value[sel]
+                n = end
+                last = _time.monotonic()
+            elif timeout is not None and _time.monotonic()-last>=timeout:
+                return
+            else:
+                _time.sleep(poll)
+    def _steps_times(self):
+        step = self._frame_index('step')
+        return step, None if self.time is None else self._frame_index('time')
+    def _frame_index(self, name):
+        """Return the step or time of the frames, read once and cached."""
+        self._sync()
+        dset = self.step if name=='step' else self.time
+        if dset is None:
+            raise ValueError("element has no time")
+        if self._index_cache is None:
+            self._index_cache = {}
+        n = min(self._nframes, dset.shape[0])
+        cache = self._index_cache.get(name)
+        if cache is None or len(cache)>n:
+            cache = np.empty((0,), dtype=dset.dtype)
+        if len(cache)<n:
+            # steps and times increase, only the new frames are read
+            cache = np.concatenate([cache, dset[len(cache):n]])
+            self._index_cache[name] = cache
+        return cache
+    def _idx_by_step(self, step):
+        steps = self._frame_index('step')
+        i = np.searchsorted(steps, step)
+        if i==len(steps) or steps[i]!=step:
+            raise KeyError("step %d not found" % step)
+        return int(i)
+    def _idx_by_time(self, time):
+        times = self._frame_index('time')
+        if len(times)==0:
+            raise KeyError("element has no frames")
+        i = int(np.searchsorted(times, time))
+        if i==len(times) or (i>0 and time-times[i-1]<=times[i]-time):
+            i -= 1
+        return i
+    def _idx_range(self, name, start, stop):
+        values = self._frame_index(name)
+        return tuple(int(i) for i in np.searchsorted(values, [start, stop]))
+    def _index_data(self, step, time, count=None):
+        result = []
         if self.own_step:
-            self.step.resize(self.step.shape[0]+1, axis=0)
-            self.step[-1] = step
+            result.append((self.step, step))
             if self.time and len(self.time.shape)==1:
-                self.time.resize(self.time.shape[0]+1, axis=0)
-                self.time[-1] = time
-    def get_by_idx(self, idx):
-        return self['value'][idx]
+                result.append((self.time, time))
+        if self.count is not None:
+            result.append((self.count, count))
+        return result
     @property
     def element_type(self):
         return 'TimeElement'
     def __repr__(self):
         return 'H5MD TimeElement'
 
+def _find_ids(id_values, ids, missing=False):
+    """Return the positions of ids in id_values.
+
+    Missing ids raise a KeyError, or get the position -1 when missing is True.
+    """
+    order = np.argsort(id_values, kind='stable')
+    pos = np.searchsorted(id_values, ids, sorter=order)
+    pos = np.minimum(pos, len(id_values)-1)
+    slots = order[pos]
+    absent = id_values[slots]!=ids
+    if np.any(absent):
+        if not missing:
+            raise KeyError("ids not found: %s" % (ids[absent],))
+        slots = np.where(absent, -1, slots)
+    return slots
+
+def frame_blocks(start, stop, stride, block):
+    """Yield the (lo, hi) bounds of the blocks of frames start:stop:stride.
+
+    The blocks begin at multiples of block, except for the first one, and
+    contain at least one selected frame.
+    """
+    lo = start
+    while lo<stop:
+        hi = min((lo//block+1)*block, stop)
+        yield lo, hi
+        lo = start + -(-(hi-start)//stride)*stride
+
+class FrameWriter(object):
+    """Append frames to several elements at once.
+
+    Within a frame, all the datasets are resized first, then all the values
+    are written (in a row of collective writes with collective=True) and
+    finally the step and time datasets, once per dataset when elements share
+    them through step_from (by rank 0 only with File(writer='mpi')).
+    Elements with a buffer or an async writer append their frame through
+    their own append, as well as variable elements. With File(stats=True),
+    the elements written directly share the time of the frame equally in
+    their 'append' record. The file is flushed after the frame when its
+    flush_interval has elapsed.
+    """
+    def __init__(self, elements):
+        self.elements = list(elements)
+    def append(self, values, step, time=None, region=None, collective=False):
+        """Append values[i] to elements[i]."""
+        if len(values)!=len(self.elements):
+            raise ValueError("FrameWriter requires one value per element")
+        t0 = _time.perf_counter()
+        direct = []
+        for e, v in zip(self.elements, values):
+            if e._writer is not None or e._buffer is not None or e.count is not None:
+                e.append(v, step, time, region=region, collective=collective)
+            else:
+                direct.append((e, v))
+        index = {}
+        for e, v in direct:
+            e._reserve(e.value, e._nframes+1)
+            for dset, data in e._index_data(step, time):
+                if dset.id not in index:
+                    e._reserve(dset, e._nframes+1)
+                    index[dset.id] = (e, dset, e._nframes, data)
+        for e, v in direct:
+            e._write_value(e._nframes, v, region, collective)
+        for e, dset, idx, data in index.values():
+            e._write_index(dset, idx, data)
+        share = (_time.perf_counter()-t0)/max(len(direct), 1)
+        for e, v in direct:
+            e._nframes += 1
+            if e._stats is not None:
+                e._stats.add(e._stats_name, 'append', share, np.size(v)*e.value.dtype.itemsize)
+        for e, v in direct:
+            f = None if e._file_ref is None else e._file_ref()
+            if f is not None:
+                f._auto_flush()
+                break
+
+REDUCTIONS = ('mean', 'variance', 'min', 'max', 'histogram')
+
+class ReducingElement(h5py.Group):
+    """Observable reduced in memory and written one record every `every` samples.
+
+    The group holds a time element per statistic of the samples of a block:
+    mean, variance (the sum of squared deviations divided by the count), min
+    and max, elementwise, and histogram, the counts of all the components in
+    the bins of the fixed element bin_edges. The count element holds the
+    number of samples of each record and its step and time, shared by the
+    others, are those of the last sample. The mean and variance are updated
+    with Welford's algorithm. The mean records are block averages, whose
+    spread estimates the error on the mean over the run.
+
+    The samples left when the file is closed form a last record with a lower
+    count. The shape and dtype of the samples are kept in the attributes of
+    the group. A reopened element appends when `every` is given again.
+    """
+    def __init__(self, loc, name, every=None, reduce=None, bins=None, range=None,
+                 shape=(), dtype=np.float64, time=None, **kwargs):
+        if every is not None and every<1:
+            raise ValueError("every must be positive")
+        is_new = name not in loc
+        if is_new:
+            if reduce is None:
+                reduce = REDUCTIONS[:4] + (('histogram',) if bins is not None else ())
+            for r in reduce:
+                if r not in REDUCTIONS:
+                    raise ValueError("unknown reduction %r" % (r,))
+            if 'histogram' in reduce and (bins is None or (np.ndim(bins)==0 and range is None)):
+                raise ValueError("histogram requires bins and range, or the bin edges")
+        g = loc.require_group(name)
+        super(ReducingElement, self).__init__(g._id)
+        if is_new:
+            # the samples may only appear in the histogram
+            self.attrs['shape'] = np.array(shape, dtype=int)
+            self.attrs['dtype'] = np.dtype(dtype).str
+            if 'histogram' in reduce:
+                element(self, 'bin_edges', store='fixed',
+                        data=np.histogram_bin_edges([], bins, range))
+            self.records = {'count': element(self, 'count', store='time', shape=(), dtype=int,
+                                             time=time, **kwargs)}
+            time = True if time else None
+            for r in reduce:
+                if r=='histogram':
+                    r_shape, r_dtype = (len(self['bin_edges'])-1,), int
+                else:
+                    r_shape, r_dtype = shape, (np.float64 if r in ('mean', 'variance') else dtype)
+                self.records[r] = element(self, r, store='time', shape=tuple(r_shape),
+                                          dtype=r_dtype, step_from=self.records['count'],
+                                          time=time, **kwargs)
+        else:
+            self.records = dict((r, element(self, r, **kwargs)) for r in ('count',) + REDUCTIONS
+                                if r in self)
+            shape, dtype = self.attrs['shape'], self.attrs['dtype']
+        self.every = every
+        self.edges = self['bin_edges'][()] if 'bin_edges' in self else None
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._frames = FrameWriter([self.records[r] for r in ('count',) + REDUCTIONS
+                                    if r in self.records])
+        self._reset()
+        f = _h5md_file(loc)
+        if f is not None:
+            f._reducers.append(self)
+    def _reuse(self, loc, kwargs):
+        if kwargs.get('every') is not None:
+            if kwargs['every']<1:
+                raise ValueError("every must be positive")
+            self.every = kwargs['every']
+        for e in self.records.values():
+            e._reuse(self, dict(kwargs))
+    def _reset(self):
+        self.n = 0
+        self._mean = np.zeros(self.shape)
+        self._m2 = np.zeros(self.shape)
+        self._min = np.empty(self.shape, dtype=self.dtype)
+        self._max = np.empty(self.shape, dtype=self.dtype)
+        if self.edges is not None:
+            self._hist = np.zeros(len(self.edges)-1, dtype=int)
+    def append(self, v, step, time=None):
+        """Add the sample v, and write a record after `every` samples."""
+        if self.every is None:
+            raise ValueError("every is required to append to a reducing element")
+        v = np.asarray(v)
+        if v.shape!=self.shape:
+            raise ValueError("the sample has shape %s instead of %s" % (v.shape, self.shape))
+        self.n += 1
+        delta = v - self._mean
+        self._mean += delta/self.n
+        self._m2 += delta*(v - self._mean)
+        if self.n==1:
+            self._min[...] = v
+            self._max[...] = v
+        else:
+            np.minimum(self._min, v, out=self._min)
+            np.maximum(self._max, v, out=self._max)
+        if self.edges is not None:
+            self._hist += np.histogram(v, self.edges)[0]
+        self._step, self._time = step, time
+        if self.n==self.every:
+            self._write()
+    def _write(self):
+        values = {'count': self.n, 'mean': self._mean, 'variance': self._m2/self.n,
+                  'min': self._min, 'max': self._max}
+        if self.edges is not None:
+            values['histogram'] = self._hist
+        self._frames.append([values[r] for r in ('count',) + REDUCTIONS if r in self.records],
+                            self._step, self._time)
+        self._reset()
+    def close(self):
+        """Write the samples added since the last record, if any."""
+        if self.n>0:
+            self._write()
+    @property
+    def element_type(self):
+        return 'ReducingElement'
+    def __repr__(self):
+        return 'H5MD ReducingElement'
+
 def default_chunks(shape):
     result = list(shape)
     if len(shape)==0:
@@ -170,11 +1215,147 @@ def default_chunks(shape):
         result[:2] = CHUNK_0_MAX, CHUNK_1_MAX
         return tuple(np.minimum(result,shape))
 
+def chunk_shape(shape, dtype, layout='auto', nbytes=None):
+    """Return a chunk shape of about nbytes bytes for a time-dependent dataset.
+
+    shape is the shape of the dataset, time being the first dimension. The
+    layout is one of
+
+    - 'frames': whole frames per chunk, for frame-wise reads. Frames larger
+      than nbytes are split along the particle axis.
+    - 'series': CHUNK_SERIES_FRAMES frames of a few particles, for reading
+      the time series of particles. Use it together with buffer_frames.
+    - 'auto': a balance of frames and particles, limited so that the chunks
+      touched by one frame fit in CHUNK_CACHE_MAX bytes.
+
+    The dimensions after the particle axis are never split.
+    """
+    if len(shape)==0:
+        raise ValueError("chunk_shape requires a time dimension")
+    if nbytes is None:
+        nbytes = CHUNK_BYTES
+    budget = max(int(nbytes)//np.dtype(dtype).itemsize, 1)
+    frame = tuple(max(int(x), 1) for x in shape[1:])
+    if len(frame)==0:
+        return (budget,)
+    inner = int(np.prod(frame[1:]))
+    per_particle = max(budget//inner, 1)
+    if layout=='frames':
+        if frame[0]*inner<=budget:
+            return (budget//(frame[0]*inner),) + frame
+        return (1, per_particle) + frame[1:]
+    elif layout=='series':
+        n_frames = min(CHUNK_SERIES_FRAMES, per_particle)
+        return (n_frames, min(frame[0], max(per_particle//n_frames, 1))) + frame[1:]
+    elif layout=='auto':
+        itemsize = np.dtype(dtype).itemsize
+        max_frames = max(CHUNK_CACHE_MAX//(frame[0]*inner*itemsize), 1)
+        n_frames = min(max(per_particle//min(frame[0], int(np.sqrt(per_particle))), 1), max_frames)
+        return (n_frames, min(frame[0], max(per_particle//n_frames, 1))) + frame[1:]
+    raise ValueError("unknown chunk layout %r" % (layout,))
+
+def _next_prime(n):
+    n = max(int(n), 2)
+    while any(n%d==0 for d in range(2, int(np.sqrt(n))+1)):
+        n += 1
+    return n
+
+def chunk_cache(shape, chunks, dtype):
+    """Return the h5py chunk cache arguments for a time-dependent dataset.
+
+    The cache holds all the chunks that contain one frame, within the limits
+    of 1 MiB (the HDF5 default) and CHUNK_CACHE_MAX bytes.
+    """
+    per_frame = int(np.prod([-(-max(s, 1)//c) for s, c in zip(shape[1:], chunks[1:])]))
+    chunk_nbytes = int(np.prod(chunks))*np.dtype(dtype).itemsize
+    nbytes = min(max(per_frame*chunk_nbytes, 1024**2), max(CHUNK_CACHE_MAX, chunk_nbytes))
+    return {'rdcc_nbytes': nbytes,
+            'rdcc_nslots': _next_prime(100*max(nbytes//chunk_nbytes, 1)),
+            'rdcc_w0': 1.}
+
+def _open_with_cache(f, path, cache):
+    """Open the dataset at path with the chunk cache arguments cache."""
+    dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+    dapl.set_chunk_cache(cache['rdcc_nslots'], cache['rdcc_nbytes'], cache['rdcc_w0'])
+    return h5py.Dataset(h5py.h5d.open(f.id, path.encode(), dapl))
+
+def compression_filters(compression, compression_opts=None):
+    """Return the h5py filter arguments for a compression preset.
+
+    The presets are
+
+    - 'fast': byte shuffle and LZF.
+    - 'small': byte shuffle and gzip, compression_opts being the level (4 by
+      default).
+    - 'zstd': byte shuffle and Zstandard, compression_opts being the level
+      (3 by default). Requires hdf5plugin.
+    - 'blosc': Blosc with LZ4 and byte shuffle, compression_opts being the
+      level (5 by default). Requires hdf5plugin.
+
+    Other values are h5py compression filters and are returned unchanged.
+    All presets are lossless.
+    """
+    if compression=='fast':
+        return {'compression': 'lzf', 'shuffle': True}
+    elif compression=='small':
+        level = 4 if compression_opts is None else compression_opts
+        return {'compression': 'gzip', 'compression_opts': level, 'shuffle': True}
+    elif compression in ('zstd', 'blosc'):
+        if hdf5plugin is None:
+            raise ValueError("compression %r requires the hdf5plugin package" % compression)
+        if compression=='zstd':
+            level = 3 if compression_opts is None else compression_opts
+            result = dict(hdf5plugin.Zstd(clevel=level))
+            result['shuffle'] = True
+        else:
+            level = 5 if compression_opts is None else compression_opts
+            result = dict(hdf5plugin.Blosc(cname='lz4', clevel=level,
+                                           shuffle=hdf5plugin.Blosc.SHUFFLE))
+        return result
+    result = {'compression': compression}
+    if compression_opts is not None:
+        result['compression_opts'] = compression_opts
+    return result
+
+def precision_digits(precision):
+    """Return the number of decimal digits kept to store values at precision.
+
+    Values stored with the HDF5 scale-offset filter and this number of digits
+    D are stored as multiples of 10**-D relative to the minimum of each chunk,
+    so that the absolute error is smaller than 10**-D <= precision.
+    """
+    if precision<=0:
+        raise ValueError("precision must be positive")
+    return max(int(np.ceil(-np.log10(precision)-1e-9)), 0)
+
 
 def element(loc, name, **kwargs):
+    """Open or create the H5MD element name in loc.
+
+    Within a pyh5md File, the element object is created once and returned by
+    the following calls, so that its buffers and write state are shared.
+    """
+    f = _h5md_file(loc)
+    if f is None:
+        return _element(loc, name, **kwargs)
+    path = posixpath.normpath(posixpath.join(loc.name, name))
+    e = f._element_cache.get(path)
+    if e is None or name not in loc:
+        if name not in loc:
+            f._catalogue = None
+        e = _element(loc, name, **kwargs)
+        if e is not None:
+            f._element_cache[path] = e
+    elif kwargs:
+        e._reuse(loc, kwargs)
+    return e
+
+def _element(loc, name, **kwargs):
     if name in loc:
         tmp_element = loc[name]
         if isinstance(tmp_element,h5py.Group):
+            if 'value' not in tmp_element and 'count' in tmp_element:
+                return ReducingElement(loc, name, **kwargs)
             assert 'value' in tmp_element
             assert 'step' in tmp_element
             if tmp_element['step'].shape==():
@@ -186,12 +1367,46 @@ def element(loc, name, **kwargs):
         else:
             return None
     store = kwargs.pop('store')
+    if store=='reduce':
+        return ReducingElement(loc, name, **kwargs)
+    precision = kwargs.pop('precision', None)
+    if precision is not None:
+        if 'data' in kwargs:
+            dtype = np.asarray(kwargs['data']).dtype
+        else:
+            dtype = np.dtype(kwargs.get('dtype', 'f'))
+        if dtype.kind!='f':
+            raise ValueError("precision requires a floating-point dtype")
+        kwargs['scaleoffset'] = precision_digits(precision)
+    compression = kwargs.pop('compression', None)
+    if compression is not None:
+        filters = compression_filters(compression, kwargs.pop('compression_opts', None))
+        # scalar datasets cannot be filtered
+        if store!='fixed' or np.ndim(kwargs.get('data'))>0 or len(kwargs.get('shape', ()))>0:
+            kwargs.update(filters)
     if store=='fixed':
+        if kwargs.pop('contiguous', False):
+            if any(k in kwargs for k in _FILTER_KEYS + ('chunks', 'maxshape', 'scaleoffset')):
+                raise ValueError("contiguous elements cannot be chunked, resized or filtered")
+            # allocate the data at creation so that it has a file offset
+            kwargs['dcpl'] = dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+            dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
         return FixedElement(loc, name, **kwargs)
+    chunks = kwargs.pop('chunks', None)
+    chunk_bytes = kwargs.pop('chunk_bytes', None)
+    if kwargs.get('variable'):
+        if store!='time':
+            raise ValueError("only time elements can have a variable number of particles")
+        # the particle axis grows with the number of particles
+        frame_shape = kwargs['shape'] if 'shape' in kwargs else np.shape(kwargs['data'])
+        if len(frame_shape)==0 or frame_shape[0]<1:
+            raise ValueError("variable elements require an initial number of particles")
+        kwargs.setdefault('maxshape', (None,) + tuple(frame_shape[1:]))
     if 'shape' in kwargs:
         assert 'data' not in kwargs
         kwargs['shape'] = (0,) + kwargs['shape']
-        kwargs['chunks'] = default_chunks(kwargs['shape'])
+        if chunks is None:
+            chunks = default_chunks(kwargs['shape'])
         if 'maxshape' in kwargs:
             kwargs['maxshape'] = (None,) + kwargs['maxshape']
         else:
@@ -206,6 +1421,12 @@ def element(loc, name, **kwargs):
         else:
             kwargs['maxshape'] = (None,) + data.shape
         kwargs['dtype'] = data.dtype
+    if isinstance(chunks, str):
+        dtype = kwargs.get('dtype', 'f')
+        kwargs['chunks'] = chunk_shape(kwargs['shape'], dtype, chunks, chunk_bytes)
+        kwargs.update(chunk_cache(kwargs['shape'], kwargs['chunks'], dtype))
+    elif chunks is not None:
+        kwargs['chunks'] = chunks
     if store=='linear':
         return LinearElement(loc, name, **kwargs)
     elif store=='time':
@@ -213,6 +1434,86 @@ def element(loc, name, **kwargs):
     else:
         raise ValueError
         
+ElementInfo = namedtuple('ElementInfo', ['name', 'element_type', 'shape', 'dtype',
+                                         'step', 'step_offset', 'time', 'time_offset'])
+ElementInfo.__doc__ = """Description of an element, as listed by File.elements().
+
+shape and dtype are those of the value dataset. For linear elements, step,
+step_offset, time and time_offset are the values of the element. For time
+elements, step and time are the names of the step and time datasets, the name
+being that of the first element found when the datasets are shared.
+"""
+
+def _offset(dset):
+    return dset.attrs['offset'] if 'offset' in dset.attrs else None
+
+def _written_steps(g):
+    """Return the steps of the frames written to the time element g."""
+    n = min(g[k].shape[0] for k in ('value', 'step', 'time', 'count') if k in g and g[k].ndim>0)
+    steps = g['step'][:n]
+    # the frames reserved by growth hold the fill value
+    decrease = np.flatnonzero(np.diff(steps)<=0)
+    if len(decrease)>0:
+        steps = steps[:decrease[0]+1]
+    return steps
+
+def _catalogue(group):
+    """Return the elements below group, found in a single traversal."""
+    groups = []
+    datasets = []
+    def visit(name, obj):
+        if name=='h5md' or name.startswith('h5md/'):
+            return
+        if isinstance(obj, h5py.Group):
+            if 'value' in obj and 'step' in obj:
+                groups.append((name, obj))
+        else:
+            datasets.append((name, obj))
+    group.visititems(visit)
+    result = {}
+    shared = {}
+    for name, g in groups:
+        value = g['value']
+        step = g['step']
+        time = g['time'] if 'time' in g else None
+        if step.shape==():
+            info = ElementInfo(name, 'LinearElement', value.shape, value.dtype,
+                               step[()], _offset(step),
+                               None if time is None else time[()],
+                               None if time is None else _offset(time))
+        else:
+            step_name = shared.setdefault(step.id, name + '/step')
+            time_name = None if time is None else shared.setdefault(time.id, name + '/time')
+            info = ElementInfo(name, 'TimeElement', value.shape, value.dtype, step_name,
+                               _offset(step), time_name, None if time is None else _offset(time))
+        result[name] = info
+    for name, d in datasets:
+        if posixpath.dirname(name) not in result:
+            result[name] = ElementInfo(name, 'FixedElement', d.shape, d.dtype,
+                                       None, None, None, None)
+    return dict(sorted(result.items()))
+
+# File arguments of the profiles. The settings that only apply when the file is
+# created are ignored otherwise.
+FILE_PROFILES = {
+    'write-stream': {'libver': 'latest', 'fs_strategy': 'page', 'fs_page_size': 64*1024,
+                     'page_buf_size': 16*1024**2},
+    'read-analysis': {'rdcc_nbytes': CHUNK_CACHE_MAX, 'rdcc_w0': 1.,
+                      'rdcc_nslots': _next_prime(100*CHUNK_CACHE_MAX//CHUNK_BYTES)},
+    'parallel-fs': {'libver': 'latest', 'alignment_threshold': 1024**2,
+                    'alignment_interval': 1024**2, 'meta_block_size': 1024**2},
+}
+_CREATION_KEYS = ('fs_strategy', 'fs_persist', 'fs_threshold', 'fs_page_size', 'page_buf_size')
+
+def _profile_kwargs(profile, mode, kwargs):
+    """Add the settings of profile to the File arguments kwargs."""
+    if profile not in FILE_PROFILES:
+        raise ValueError("unknown profile %r" % (profile,))
+    for k, v in FILE_PROFILES[profile].items():
+        # the page buffer requires a file created with paging
+        if mode in ('w', 'w-', 'x') or k not in _CREATION_KEYS:
+            kwargs.setdefault(k, v)
+
 class File(h5py.File):
     def __init__(self, name, mode=None, *args, **kwargs):
         if mode=='w':
@@ -220,7 +1521,40 @@ class File(h5py.File):
             author_email = kwargs.pop('author_email', None)
             creator = kwargs.pop('creator', 'N/A')
             creator_version = kwargs.pop('creator_version', 'N/A')
+        writer = kwargs.pop('writer', None)
+        queue_size = kwargs.pop('queue_size', 64)
+        flush_interval = kwargs.pop('flush_interval', None)
+        stats = kwargs.pop('stats', False)
+        stats_hook = kwargs.pop('stats_hook', None)
+        resume = kwargs.pop('resume', False)
+        profile = kwargs.pop('profile', None)
+        if profile is not None:
+            _profile_kwargs(profile, mode, kwargs)
+        element_chunk_cache = kwargs.pop('element_chunk_cache', True)
+        if resume and mode not in ('a', 'r+'):
+            raise ValueError("resume requires the mode 'a' or 'r+'")
+        swmr_write = mode not in (None, 'r') and kwargs.pop('swmr', False)
+        if swmr_write:
+            kwargs.setdefault('libver', 'latest')
+        if writer not in (None, 'async', 'mpi'):
+            raise ValueError("unknown writer %r" % (writer,))
+        if writer=='async' and kwargs.get('driver')=='mpio':
+            raise ValueError("the async writer cannot be used with the mpio driver")
+        if writer=='mpi' and kwargs.get('driver')!='mpio':
+            raise ValueError("the mpi writer requires the mpio driver")
         super(File, self).__init__(name, mode, *args, **kwargs)
+        self._elements = []
+        self._reducers = []
+        self._element_cache = {}
+        self._catalogue = None
+        self._swmr_write = swmr_write
+        self._flush_interval = flush_interval
+        self._last_flush = _time.monotonic()
+        self._writer = AsyncWriter(queue_size) if writer=='async' else None
+        self._comm = kwargs['comm'] if writer=='mpi' else None
+        self._element_chunk_cache = element_chunk_cache
+        self._stats = IOStats(stats_hook) if stats or stats_hook is not None else None
+        _open_files[self.id] = self
         if mode=='w':
             g = self.create_group('h5md')
             g.attrs['version'] = np.array([1,1])
@@ -237,10 +1571,141 @@ class File(h5py.File):
             g = self['h5md']
             assert 'author' in g
             assert 'creator' in g
+            if resume:
+                self._resume()
+
+    def _resume(self):
+        """Truncate the elements after the last step that all of them reached.
+
+        The frames of a time element are those where value, step, time and
+        count are written and the steps increase, which excludes the frames
+        reserved by growth. Each element keeps its frames up to the smallest
+        of the last steps of the elements, time elements without frames
+        being ignored, so that the run continues from that step.
+        """
+        info = _catalogue(self)
+        steps = dict((name, _written_steps(self[name])) for name, e in info.items()
+                     if e.element_type=='TimeElement')
+        last_steps = [x[-1] for x in steps.values() if len(x)>0]
+        for name, e in info.items():
+            if e.element_type=='LinearElement' and e.shape[0]>0:
+                last_steps.append((e.step_offset or 0) + (e.shape[0]-1)*e.step)
+        if len(last_steps)==0:
+            return
+        last = min(last_steps)
+        resized = set()
+        for name, e in info.items():
+            g = self[name]
+            if e.element_type=='TimeElement':
+                n = int(np.searchsorted(steps[name], last, side='right'))
+                datasets = [g[k] for k in ('value', 'step', 'time', 'count') if k in g]
+            elif e.element_type=='LinearElement':
+                offset = e.step_offset or 0
+                n = int(min(max((last - offset)//e.step + 1, 0), g['value'].shape[0]))
+                datasets = [g['value']]
+            else:
+                continue
+            for d in datasets:
+                if d.ndim>0 and d.id not in resized and d.shape[0]!=n:
+                    d.resize(n, axis=0)
+                    resized.add(d.id)
+        self._catalogue = None
 
     def particles_group(self, name):
         return ParticlesGroup(self, name)
 
+    def mpi_region(self, n):
+        """Return the region of the n particles of this rank and the total.
+
+        The regions of the ranks follow each other in rank order, their
+        offsets being computed with an exscan so that n may differ between
+        ranks. Collective, for File(writer='mpi').
+        """
+        if self._comm is None:
+            raise ValueError("the file was not opened with writer='mpi'")
+        start = self._comm.exscan(n)
+        if start is None:
+            start = 0
+        return (start, start+n), self._comm.allreduce(n)
+
+    def elements(self, refresh=False):
+        """Return the ElementInfo of all the elements of the file by name.
+
+        The file is traversed once and the result is kept until an element is
+        created or refresh is True. The shapes are those at the time of the
+        traversal.
+        """
+        if self._catalogue is None or refresh:
+            self._catalogue = _catalogue(self)
+        return self._catalogue
+
+    def flush(self):
+        """Write the buffered frames, trim preallocated datasets and flush the file."""
+        if self._writer is not None:
+            self._writer.drain()
+        for e in self._elements:
+            e.flush()
+        t0 = _time.perf_counter()
+        super(File, self).flush()
+        if self._stats is not None:
+            self._stats.add('/', 'flush', _time.perf_counter()-t0)
+        self._last_flush = _time.monotonic()
+
+    def stats(self, reset=False):
+        """Return the I/O statistics of the elements, for File(stats=True).
+
+        Return a list of records (dicts with keys element, operation, count,
+        seconds and bytes), one per element and operation, that can be passed
+        to pandas.DataFrame. The counters restart from zero when reset is
+        True. The flushes of the file itself are listed under the name '/'.
+        See IOStats for the operations.
+        """
+        if self._stats is None:
+            raise ValueError("the file was not opened with stats=True")
+        return self._stats.result(reset)
+
+    def start_swmr(self):
+        """Flush the file and let SWMR readers open it.
+
+        The file must have been opened with swmr=True. No element can be
+        created afterwards.
+        """
+        if not self._swmr_write:
+            raise ValueError("the file was not opened with swmr=True")
+        self.flush()
+        self.swmr_mode = True
+
+    def _auto_flush(self):
+        if _time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def __exit__(self, *args):
+        # h5py.File.__exit__ holds the h5py lock, that the writer thread needs
+        if self.id:
+            self.close()
+
+    def close(self):
+        writer = self._writer
+        if self.id.valid:
+            if writer is None or writer.error is None:
+                for r in self._reducers:
+                    r.close()
+            self._reducers = []
+            if writer is not None:
+                writer.close()
+                self._writer = None
+                for e in self._elements:
+                    e._writer = None
+            if writer is None or writer.error is None:
+                for e in self._elements:
+                    e.flush()
+            self._elements = []
+            self._element_cache = {}
+            _open_files.pop(self.id, None)
+        super(File, self).close()
+        if writer is not None and not writer.reported:
+            writer.check()
+
 class ParticlesGroup(h5py.Group):
     """Represents a particles group within a H5MD file."""
     def __init__(self, parent, name):
@@ -255,3 +1720,26 @@ class ParticlesGroup(h5py.Group):
             self.box.attrs['boundary'] = list(boundary)
         if len(kwargs)>0:
             self.box.edges = element(self.box, 'edges', **kwargs)
+
+    def elements(self, refresh=False):
+        """Return the ElementInfo of the elements of the group by name.
+
+        The names are relative to the group. See File.elements.
+        """
+        f = _h5md_file(self)
+        if f is None:
+            return _catalogue(self)
+        prefix = self.name.lstrip('/') + '/'
+        return dict((k[len(prefix):], v._replace(name=k[len(prefix):]))
+                    for k, v in f.elements(refresh).items() if k.startswith(prefix))
+
+    def append_frame(self, step, time=None, region=None, collective=False, **arrays):
+        """Append one frame to the elements of the group named in arrays.
+
+        The keyword 'box' stands for the box edges. The frame is written with
+        a FrameWriter, see its documentation.
+        """
+        names = sorted(arrays)
+        elements = [element(self, 'box/edges' if name=='box' else name) for name in names]
+        FrameWriter(elements).append([arrays[name] for name in names], step,
+                                     time, region, collective)
@@ -0,0 +1,97 @@
+"""
+Process-parallel analysis of the frames of H5MD files.
+
+map_frames splits the frames of a time element in shards aligned with the
+chunks of its value dataset. Every worker process opens the file read-only
+once and applies a function to the frames of the shards it receives, read in
+blocks of chunks of at most max_bytes bytes.
+"""
+import functools
+import multiprocessing
+
+import numpy as np
+
+from .h5md_module import File, element, frame_blocks
+
+MAX_BYTES = 256*1024**2
+
+_worker = {}
+
+
+def _open(filename, path):
+    f = File(filename, 'r')
+    _worker['file'] = f
+    _worker['element'] = element(f, path)
+
+
+def _shard_frames(stride, max_bytes, bounds):
+    e = _worker['element']
+    frame_nbytes = max(int(np.prod(e.value.shape[1:]))*e.value.dtype.itemsize, 1)
+    chunk = e.value.chunks[0] if e.value.chunks else 1
+    # iter_frames rounds the blocks up to whole chunks
+    block = max(int(max_bytes)//(frame_nbytes*chunk), 1)*chunk
+    for steps, times, values in e.iter_frames(bounds[0], bounds[1], stride, block, prefetch=False):
+        if times is None:
+            times = [None]*len(steps)
+        for frame in zip(steps, times, values):
+            yield frame
+
+
+def _map_shard(func, reduce, stride, max_bytes, bounds):
+    frames = _shard_frames(stride, max_bytes, bounds)
+    results = (func(step, time, value) for step, time, value in frames)
+    if reduce is not None:
+        return functools.reduce(reduce, results)
+    return list(results)
+
+
+def _iterate(pool, results):
+    with pool:
+        for shard in results:
+            for result in shard:
+                yield result
+
+
+def map_frames(filename, element_path, func, frames=slice(None), workers=None,
+               reduce=None, shard_frames=None, max_bytes=MAX_BYTES, context='spawn'):
+    """Apply func(step, time, value) to the frames of a time element.
+
+    filename and element_path locate the element, frames is a slice of its
+    frames. The frames are split in shards of shard_frames frames (by
+    default, about four shards per worker), rounded to a multiple of the
+    chunk size along time. A worker reads a shard in blocks of whole chunks
+    of at most max_bytes bytes (at least one chunk) and calls func frame by
+    frame. workers processes are used, the number of cores by default. func
+    and reduce must be picklable, for instance functions defined at the top
+    level of a module.
+
+    Return an iterator over the results in the order of the frames. When
+    reduce is given, the results are combined with reduce(a, b), first
+    within each shard and then across shards, and the combined value is
+    returned, None when no frame is selected. reduce must thus be
+    associative.
+    """
+    with File(filename, 'r') as f:
+        e = element(f, element_path)
+        if e is None or e.element_type!='TimeElement':
+            raise ValueError("%s is not a time element" % element_path)
+        start, stop, stride = frames.indices(e.value.shape[0])
+        chunk = e.value.chunks[0] if e.value.chunks else 1
+    if stride<1:
+        raise ValueError("stride must be positive")
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if shard_frames is None:
+        shard_frames = -(-max(stop-start, 1)//(4*workers))
+    shard_frames = max(-(-shard_frames//chunk), 1)*chunk
+    shards = list(frame_blocks(start, stop, stride, shard_frames))
+    if len(shards)==0:
+        return None if reduce is not None else iter([])
+
+    pool = multiprocessing.get_context(context).Pool(
+        workers, initializer=_open, initargs=(filename, element_path))
+    results = pool.imap(functools.partial(_map_shard, func, reduce, stride, max_bytes), shards)
+    if reduce is None:
+        return _iterate(pool, results)
+    with pool:
+        return functools.reduce(reduce, list(results))
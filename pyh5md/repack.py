@@ -0,0 +1,258 @@
+"""
+Copy H5MD files with a new storage layout.
+
+repack copies a file element by element. The value, step, time and count
+datasets of the time-dependent elements are read in blocks of at most
+max_bytes bytes and written with new chunks, compression or dtype, keeping
+one frame in stride. The other datasets, such as fixed elements and the h5md
+group, are copied as they are. The step and time datasets shared between
+elements stay shared, and the object references in attributes, such as
+particles_group, point to the objects of the new file.
+
+The pyh5md-repack command calls repack, see pyh5md-repack --help.
+"""
+import argparse
+import multiprocessing
+import os
+
+import numpy as np
+import h5py
+
+from .h5md_module import (COMPRESSION_PRESETS, chunk_shape, compression_filters,
+                          precision_digits)
+
+MAX_BYTES = 256*1024**2
+
+
+def _copy_attrs(src, dst, refs):
+    for name in src.attrs:
+        dtype = src.attrs.get_id(name).dtype
+        if h5py.check_dtype(ref=dtype) is not None:
+            # the referenced object may not exist yet in the new file
+            refs.append((dst.name, name, src.attrs[name]))
+        else:
+            dst.attrs.create(name, src.attrs[name], dtype=dtype)
+
+
+def _copy_frames(dset, group, name, frames, max_bytes, refs=None, **kwargs):
+    """Copy the frames start:stop:stride of dset to a new dataset of group."""
+    start, stop, stride = frames
+    n = len(range(start, stop, stride))
+    out = group.create_dataset(name, shape=(n,)+dset.shape[1:],
+                               maxshape=(None,)+dset.maxshape[1:],
+                               fillvalue=dset.fillvalue, **kwargs)
+    _copy_attrs(dset, out, [] if refs is None else refs)
+    frame_nbytes = max(int(np.prod(dset.shape[1:]))*dset.dtype.itemsize, 1)
+    block = max(int(max_bytes)//frame_nbytes, 1)
+    if out.chunks and block>=out.chunks[0]:
+        # whole chunks of the new dataset
+        block -= block % out.chunks[0]
+    for lo in range(0, n, block):
+        hi = min(lo+block, n)
+        out[lo:hi] = dset[start+lo*stride:start+(hi-1)*stride+1:stride]
+    return out
+
+
+def _dataset_options(dset, options, is_value, n):
+    """Return the create_dataset arguments of the copy of n frames of dset."""
+    kwargs = {'dtype': dset.dtype}
+    if is_value and options['dtype'] is not None and dset.dtype.kind=='f':
+        kwargs['dtype'] = np.dtype(options['dtype'])
+    if is_value and options['chunks'] is not None:
+        shape = (max(n, 1),) + dset.shape[1:]
+        kwargs['chunks'] = chunk_shape(shape, kwargs['dtype'], options['chunks'],
+                                       options['chunk_bytes'])
+    else:
+        kwargs['chunks'] = dset.chunks
+    source = _source_filters(dset)
+    if options['compression'] is not None:
+        kwargs.update(compression_filters(options['compression'], options['compression_opts']))
+    else:
+        kwargs.update((k, v) for k, v in source.items() if k!='scaleoffset')
+    if is_value and options['precision'] is not None and kwargs['dtype'].kind=='f':
+        kwargs['scaleoffset'] = precision_digits(options['precision'])
+    elif 'scaleoffset' in source and kwargs['dtype'].kind==dset.dtype.kind:
+        kwargs['scaleoffset'] = source['scaleoffset']
+    return kwargs
+
+
+def _source_filters(dset):
+    """Return the create_dataset filter arguments that reproduce the filters of dset."""
+    kwargs = {}
+    plist = dset.id.get_create_plist()
+    for i in range(plist.get_nfilters()):
+        code, flags, values, name = plist.get_filter(i)
+        if code==h5py.h5z.FILTER_DEFLATE:
+            kwargs.update(compression='gzip', compression_opts=values[0])
+        elif code==h5py.h5z.FILTER_LZF:
+            kwargs['compression'] = 'lzf'
+        elif code==h5py.h5z.FILTER_SHUFFLE:
+            kwargs['shuffle'] = True
+        elif code==h5py.h5z.FILTER_FLETCHER32:
+            kwargs['fletcher32'] = True
+        elif code==h5py.h5z.FILTER_SCALEOFFSET:
+            kwargs['scaleoffset'] = dset.scaleoffset
+        elif code==h5py.h5z.FILTER_SZIP:
+            kwargs.update(compression='szip', compression_opts=dset.compression_opts)
+        elif code!=h5py.h5z.FILTER_NBIT:
+            kwargs.update(compression=code, compression_opts=tuple(values))
+    return kwargs
+
+
+def _repack_value(args):
+    """Write the value of the element at path to the temporary file tmp."""
+    source, tmp, path, options = args
+    with h5py.File(source, 'r') as src, h5py.File(tmp, 'w') as dst:
+        dset = src[path]['value']
+        frames = options['frames'].indices(dset.shape[0])
+        _copy_frames(dset, dst, 'value', frames, options['max_bytes'],
+                     **_dataset_options(dset, options, True, len(range(*frames))))
+    return path, tmp
+
+
+class _Repack(object):
+    def __init__(self, src, dst, options):
+        self.src = src
+        self.dst = dst
+        self.options = options
+        self.copied = {}
+        self.refs = []
+        self.values = []
+
+    def group(self, src_group, dst_group):
+        for name in src_group:
+            self.member(src_group, dst_group, name)
+
+    def member(self, src_group, dst_group, name):
+        link = src_group.get(name, getlink=True)
+        if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+            dst_group[name] = link
+            return
+        obj = src_group[name]
+        if obj.id in self.copied:
+            dst_group[name] = self.dst[self.copied[obj.id]]
+            return
+        if isinstance(obj, h5py.Group):
+            g = dst_group.create_group(name)
+            _copy_attrs(obj, g, self.refs)
+            if 'value' in obj and 'step' in obj and not obj.name.startswith('/h5md'):
+                self.element(obj, g)
+            else:
+                self.group(obj, g)
+        else:
+            self.dataset(obj, dst_group, name)
+        self.copied[obj.id] = dst_group[name].name
+
+    def dataset(self, obj, dst_group, name):
+        self.src.copy(obj, dst_group, name, without_attrs=True)
+        _copy_attrs(obj, dst_group[name], self.refs)
+
+    def element(self, src_group, dst_group):
+        # the frames of value, step, time and count correspond
+        start, stop, stride = frames = self.options['frames'].indices(src_group['value'].shape[0])
+        n = len(range(*frames))
+        linear = src_group['step'].shape==()
+        for name in src_group:
+            obj = src_group[name]
+            if obj.id in self.copied:
+                dst_group[name] = self.dst[self.copied[obj.id]]
+                continue
+            if name=='value' and self.options['workers']>1:
+                self.values.append(src_group.name)
+                continue
+            if linear and name in ('step', 'time'):
+                # frame i of the copy is frame start + i*stride
+                d = dst_group.create_dataset(name, data=obj[()]*stride)
+                _copy_attrs(obj, d, self.refs)
+                offset = obj.attrs['offset'] if 'offset' in obj.attrs else 0
+                if 'offset' in obj.attrs or start>0:
+                    d.attrs['offset'] = offset + start*obj[()]
+            elif name=='value' or (not linear and name in ('step', 'time', 'count')):
+                _copy_frames(obj, dst_group, name, frames, self.options['max_bytes'],
+                             self.refs, **_dataset_options(obj, self.options, name=='value', n))
+            elif isinstance(obj, h5py.Group):
+                g = dst_group.create_group(name)
+                _copy_attrs(obj, g, self.refs)
+                self.group(obj, g)
+            else:
+                self.dataset(obj, dst_group, name)
+            self.copied[obj.id] = dst_group[name].name
+
+    def references(self):
+        def target(ref):
+            return self.dst[self.src[ref].name].ref if ref else ref
+        for path, name, value in self.refs:
+            if isinstance(value, h5py.Reference):
+                self.dst[path].attrs[name] = target(value)
+            else:
+                data = np.array([target(r) for r in np.ravel(value)], dtype=h5py.ref_dtype)
+                self.dst[path].attrs[name] = data.reshape(np.shape(value))
+
+
+def repack(source, target, chunks=None, chunk_bytes=None, compression=None,
+           compression_opts=None, precision=None, dtype=None, frames=slice(None),
+           max_bytes=MAX_BYTES, workers=1):
+    """Copy the H5MD file source to target with a new storage layout.
+
+    chunks is a chunk layout of chunk_shape ('auto', 'frames' or 'series')
+    for the value datasets, the chunks of source being kept by default.
+    compression and compression_opts are those of compression_filters and
+    apply to the value, step, time and count datasets, which keep the filters
+    of source by default. precision stores floating-point values with the
+    scale-offset filter and dtype converts them, for instance to float32.
+    frames is a slice of the frames of all the time-dependent elements. The
+    datasets are read in blocks of at most max_bytes bytes (at least one
+    frame). frames is applied to each element, with its own number of frames.
+    With workers > 1, the value datasets are written in parallel by
+    workers processes to temporary files that are then copied to target.
+    """
+    if frames.step is not None and frames.step<1:
+        raise ValueError("stride must be positive")
+    with h5py.File(source, 'r') as src:
+        if 'h5md' not in src:
+            raise KeyError("h5md group not found in file")
+        options = dict(chunks=chunks, chunk_bytes=chunk_bytes, compression=compression,
+                       compression_opts=compression_opts, precision=precision, dtype=dtype,
+                       frames=frames, max_bytes=max_bytes, workers=workers)
+        with h5py.File(target, 'w') as dst:
+            _copy_attrs(src, dst, [])
+            r = _Repack(src, dst, options)
+            r.group(src, dst)
+            if r.values:
+                tasks = [(source, '%s.%d.tmp' % (target, i), path, options)
+                         for i, path in enumerate(r.values)]
+                pool = multiprocessing.get_context('spawn').Pool(workers)
+                with pool:
+                    for path, tmp in pool.imap_unordered(_repack_value, tasks):
+                        with h5py.File(tmp, 'r') as t:
+                            t.copy(t['value'], dst[path], 'value', without_attrs=True)
+                            _copy_attrs(src[path]['value'], dst[path]['value'], r.refs)
+                        os.remove(tmp)
+            r.references()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pyh5md-repack', description=
+        "Copy a H5MD file with new chunks, compression or dtype, and a subset of its frames.")
+    parser.add_argument('source', help='H5MD file to read')
+    parser.add_argument('target', help='H5MD file to write')
+    parser.add_argument('--chunks', choices=('auto', 'frames', 'series'),
+                        help='chunk layout of the values (default: keep)')
+    parser.add_argument('--chunk-bytes', type=int, help='size of the chunks in bytes')
+    parser.add_argument('--compression', help='one of %s, gzip or lzf (default: keep)'
+                        % ', '.join(COMPRESSION_PRESETS))
+    parser.add_argument('--compression-opts', type=int, help='compression level')
+    parser.add_argument('--precision', type=float,
+                        help='absolute precision of floating-point values')
+    parser.add_argument('--dtype', help='dtype of floating-point values, e.g. float32')
+    parser.add_argument('--start', type=int, help='first frame')
+    parser.add_argument('--stop', type=int, help='frame to stop at')
+    parser.add_argument('--stride', type=int, help='keep one frame in stride')
+    parser.add_argument('--max-bytes', type=int, default=MAX_BYTES, help='memory used per block')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes')
+    args = parser.parse_args(argv)
+    repack(args.source, args.target, chunks=args.chunks, chunk_bytes=args.chunk_bytes,
+           compression=args.compression, compression_opts=args.compression_opts,
+           precision=args.precision, dtype=args.dtype,
+           frames=slice(args.start, args.stop, args.stride),
+           max_bytes=args.max_bytes, workers=args.workers)
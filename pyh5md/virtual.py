@@ -0,0 +1,171 @@
+"""
+Concatenation of H5MD files with virtual datasets.
+
+concat builds a H5MD file whose time-dependent elements are HDF5 virtual
+datasets that map onto the frames of several files, the segments of a run.
+No frame is copied, and the file is read with element() as any H5MD file.
+"""
+import os
+
+import numpy as np
+import h5py
+
+from .h5md_module import _written_steps
+from .repack import _Repack, _copy_attrs
+
+
+def _source_name(filename, out):
+    # relative to the directory of the virtual file, so that they can be moved together
+    return os.path.relpath(os.path.abspath(filename), os.path.dirname(os.path.abspath(out)))
+
+
+def _linear(g):
+    """Return the step and step offset of the linear element g."""
+    step = g['step']
+    return step[()], step.attrs['offset'] if 'offset' in step.attrs else 0
+
+
+class _Concat(_Repack):
+    def __init__(self, segments, names, dst):
+        super(_Concat, self).__init__(segments[0], dst, {})
+        self.segments = segments
+        self.names = names
+
+    def group(self, src_group, dst_group):
+        super(_Concat, self).group(src_group, dst_group)
+        if src_group.name.startswith('/h5md'):
+            return
+        # the elements and groups created in a later segment
+        for s in self.segments:
+            other = s.get(src_group.name)
+            if isinstance(other, h5py.Group):
+                for name in other:
+                    if name not in dst_group:
+                        self.member(other, dst_group, name)
+
+    def dataset(self, obj, dst_group, name):
+        if not obj.name.startswith('/h5md'):
+            for s in self.segments:
+                other = s.get(obj.name)
+                if isinstance(other, h5py.Dataset) and other.id==obj.id:
+                    continue
+                if not isinstance(other, h5py.Dataset) or other.shape!=obj.shape or \
+                   other.dtype!=obj.dtype or not np.array_equal(other[()], obj[()]):
+                    raise ValueError("%s differs between the files" % obj.name)
+        super(_Concat, self).dataset(obj, dst_group, name)
+
+    def element(self, src_group, dst_group):
+        groups = [s.get(src_group.name) for s in self.segments]
+        first = src_group
+        if src_group['step'].shape==():
+            frames = self.linear_frames(src_group.name, groups)
+            # the step and time offsets are those of the first frame kept
+            first = next((g for g, n in zip(groups, frames) if n>0), src_group)
+        else:
+            frames = self.time_frames(groups)
+        for name in src_group:
+            obj = src_group[name]
+            if obj.id in self.copied:
+                dst_group[name] = self.dst[self.copied[obj.id]]
+                continue
+            if name in ('value', 'step', 'time', 'count') and obj.ndim>0:
+                dsets = [None if g is None else g[name] for g in groups]
+                self.virtual(dst_group, name, dsets, frames)
+                _copy_attrs(obj, dst_group[name], self.refs)
+            elif name in ('step', 'time') and first is not src_group:
+                first.file.copy(first[name], dst_group, name, without_attrs=True)
+                _copy_attrs(first[name], dst_group[name], self.refs)
+            elif isinstance(obj, h5py.Group):
+                g = dst_group.create_group(name)
+                _copy_attrs(obj, g, self.refs)
+                self.group(obj, g)
+            else:
+                _Repack.dataset(self, obj, dst_group, name)
+            self.copied[obj.id] = dst_group[name].name
+
+    def time_frames(self, groups):
+        """Return the number of frames of each segment kept in the result.
+
+        A segment replaces the frames of the previous ones from its first step
+        on, as when a run is restarted from a checkpoint.
+        """
+        steps = [np.empty((0,), dtype=int) if g is None else _written_steps(g) for g in groups]
+        result = []
+        first = None
+        for s in reversed(steps):
+            result.append(len(s) if first is None else int(np.searchsorted(s, first)))
+            if len(s)>0:
+                first = s[0] if first is None else min(first, s[0])
+        return result[::-1]
+
+    def linear_frames(self, name, groups):
+        result = []
+        first = None
+        for g in reversed(groups):
+            n = 0
+            if g is not None and g['value'].shape[0]>0:
+                step, offset = _linear(g)
+                n = g['value'].shape[0]
+                if first is not None:
+                    n = min(n, max(int(-(-(first - offset)//step)), 0))
+                first = offset if first is None else min(first, offset)
+            result.append(n)
+        result = result[::-1]
+        # the kept frames must follow each other with the same step
+        increment = end = None
+        for g, n in zip(groups, result):
+            if n==0:
+                continue
+            step, offset = _linear(g)
+            if (increment is not None and step!=increment) or (end is not None and offset!=end):
+                raise ValueError("the frames of %s do not follow each other" % name)
+            increment, end = step, offset + n*step
+        return result
+
+    def virtual(self, group, name, dsets, frames):
+        ref = next(d for d in dsets if d is not None)
+        frame_shape = ()
+        if ref.ndim>1:
+            shapes = [d.shape[1:] for d in dsets if d is not None]
+            frame_shape = tuple(np.max(shapes, axis=0).astype(int))
+        layout = h5py.VirtualLayout(shape=(sum(frames),)+frame_shape, dtype=ref.dtype)
+        offset = 0
+        for filename, d, n in zip(self.names, dsets, frames):
+            if n==0:
+                continue
+            source = h5py.VirtualSource(filename, d.name, shape=d.shape)
+            # a variable element may have fewer particles in this segment
+            sel = tuple(slice(0, x) for x in d.shape[1:])
+            layout[(slice(offset, offset+n),)+sel] = source[(slice(0, n),)+sel]
+            offset += n
+        group.create_virtual_dataset(name, layout, fillvalue=ref.fillvalue)
+
+
+def concat(files, out):
+    """Write the H5MD file out, the concatenation of the frames of files.
+
+    The files are the segments of a run, in order. The value, step, time and
+    count datasets of the time-dependent elements of out are virtual datasets
+    that refer to the files, by their path relative to out. When a file
+    begins at a step that is already in the previous files, its frames
+    replace theirs from that step on. The linear elements must continue each
+    other. A time-dependent element created in a later file has the frames
+    of the files in which it exists. The other datasets, such as fixed
+    elements, must be identical in all the files and are copied, as the h5md
+    group of the first file.
+    """
+    if len(files)==0:
+        raise ValueError("concat requires at least one file")
+    segments = [h5py.File(f, 'r') for f in files]
+    try:
+        for s in segments:
+            if 'h5md' not in s:
+                raise KeyError("h5md group not found in %s" % s.filename)
+        with h5py.File(out, 'w', libver=('v110', 'latest')) as dst:
+            _copy_attrs(segments[0], dst, [])
+            c = _Concat(segments, [_source_name(f, out) for f in files], dst)
+            c.group(segments[0], dst)
+            c.references()
+    finally:
+        for s in segments:
+            s.close()
@@ -0,0 +1,70 @@
+import pyh5md
+from pyh5md import analysis
+import numpy as np
+import tracemalloc
+
+
+def naive_msd(r, n_lags):
+    T = r.shape[0]
+    result = np.empty((n_lags, r.shape[1]))
+    for n in range(n_lags):
+        result[n] = np.mean(np.sum((r[n:] - r[:T-n])**2, axis=2), axis=0)
+    return result
+
+
+def test_msd(tmpdir):
+    r = np.cumsum(np.random.normal(size=(200, 30, 2)), axis=0)
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position',
+                             store='time', data=r[0], time=True)
+        for i in range(len(r)):
+            pos.append(r[i], 10*i, 0.5*i + 1)
+        expected = naive_msd(r, 50)
+        # a small memory budget forces several blocks of particles
+        lags, mean, error, per_particle = analysis.msd(
+            pos, max_lag=50, max_bytes=(16*200 + 32*512)*2*7, per_particle=True)
+        assert np.allclose(per_particle, expected)
+        assert np.allclose(mean, expected.mean(axis=1))
+        assert np.allclose(error, expected.std(axis=1)/np.sqrt(29))
+        assert np.allclose(lags, 0.5*np.arange(50))
+        lags, mean, error = analysis.msd(pos, frames=slice(None, None, 2),
+                                         max_lag=10, use_time=False)
+        assert np.allclose(lags, 20*np.arange(10))
+        assert np.allclose(mean, naive_msd(r[::2], 10).mean(axis=1))
+
+
+def test_msd_buffered(tmpdir):
+    r = np.cumsum(np.random.normal(size=(100, 5, 3)), axis=0)
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             data=r[0], buffer_frames=64)
+        for i in range(len(r)):
+            pos.append(r[i], i)
+        lags, mean, error = analysis.msd(pos, use_time=False)
+        assert len(lags) == len(mean) == 100
+        assert np.allclose(mean, naive_msd(r, 100).mean(axis=1))
+
+
+def test_time_correlation():
+    v = np.random.normal(size=(100, 5, 3))
+    lags, mean, error = analysis.vacf(v, max_lag=20)
+    expected = [np.mean(np.sum(v[:100-n]*v[n:], axis=2)) for n in range(20)]
+    assert np.allclose(mean, expected)
+    assert np.all(lags == np.arange(20))
+    w = np.random.normal(size=(100, 5))
+    lags, mean, error = analysis.time_correlation(v[:, :, 0], w, max_lag=20)
+    expected = [np.mean(v[:100-n, :, 0]*w[n:]) for n in range(20)]
+    assert np.allclose(mean, expected)
+    lags, mean, error = analysis.time_correlation(w[:, 0])
+    assert np.isnan(error[0])
+    assert np.isclose(mean[0], np.mean(w[:, 0]**2))
+
+
+def test_max_bytes():
+    # the FFT of 1025 frames has 4096 points
+    r = np.random.normal(size=(1025, 500, 3))
+    tracemalloc.start()
+    analysis.msd(r, max_bytes=4*1024**2)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 4*1024**2
@@ -0,0 +1,59 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+def test_async_writer(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w', writer='async', queue_size=4) as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(8, 3),
+                             dtype=np.float64, time=True)
+        vel = pyh5md.element(g, 'velocity', store='time', shape=(8, 3),
+                             dtype=np.float64, step_from=pos, time=True,
+                             buffer_frames=3)
+        obs = pyh5md.element(f, 'observables/x', store='linear', data=0.,
+                             step=2)
+        r = np.zeros((8, 3))
+        for i in range(50):
+            # the frame is copied, it can be modified after append returns
+            r[:] = i
+            pos.append(r, i, 0.1*i)
+            vel.append(-r, i, 0.1*i)
+            obs.append(float(i))
+        assert pos.get_by_idx(-1)[0, 0] == 49
+        assert vel.get_by_idx(slice(None)).shape == (50, 8, 3)
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        assert np.all(pos.value[:, 0, 0] == np.arange(50))
+        assert np.all(pos.step[:] == np.arange(50))
+        assert np.allclose(pos.time[:], 0.1*np.arange(50))
+        assert np.all(pyh5md.element(g, 'velocity').value[:, 0, 0] == -np.arange(50))
+        assert np.all(pyh5md.element(f, 'observables/x').value[:] == np.arange(50))
+
+
+def test_async_writer_error(tmpdir):
+    f = pyh5md.File(str(tmpdir.join('test.h5')), mode='w', writer='async')
+    pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                         shape=(8, 3), dtype=np.float64)
+    pos.append(np.zeros((5, 2)), 0)
+    with pytest.raises(RuntimeError):
+        f.flush()
+    with pytest.raises(RuntimeError):
+        pos.append(np.zeros((8, 3)), 1)
+    f.close()
+
+
+def test_async_writer_exit(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w', writer='async') as f:
+        obs = [pyh5md.element(f, 'observables/o%d' % i, store='time', shape=(),
+                              dtype=np.float64) for i in range(10)]
+        for i in range(50):
+            for o in obs:
+                o.append(float(i), i)
+
+    with pyh5md.File(fname, 'r') as f:
+        assert np.all(pyh5md.element(f, 'observables/o9').value[:] == np.arange(50))
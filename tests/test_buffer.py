@@ -0,0 +1,46 @@
+import pyh5md
+import numpy as np
+
+
+def test_buffered_time_element(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w', author='Pierre de Buyl',
+                     creator='pyh5md test_buffer') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4, 3),
+                             dtype=np.float64, time=True, buffer_frames=4)
+        vel = pyh5md.element(g, 'velocity', store='time', shape=(4, 3),
+                             dtype=np.float64, step_from=pos, time=True,
+                             buffer_bytes=1024)
+        for i in range(10):
+            pos.append(np.full((4, 3), i), 10*i, 0.5*i)
+            vel.append(np.full((4, 3), -i), 10*i, 0.5*i)
+        # two full blocks were written, two frames are still in memory
+        assert pos.value.shape[0] == 8
+        assert pos.get_by_idx(slice(None)).shape == (10, 4, 3)
+        assert pos.get_by_idx(-1)[0, 0] == 9
+        assert np.all(pos.get_by_idx(slice(None, None, -3))[:, 0, 0] == [9, 6, 3, 0])
+        # the other axes, for frames in the file and in memory
+        assert np.all(pos.get_by_idx((slice(6, None), 1, 2)) == [6, 7, 8, 9])
+        assert pos.get_by_idx((9, 2, 0)) == 9
+        assert pos.get_by_idx((1, 2)).shape == (3,)
+        assert pos.get_by_idx((Ellipsis, 0)).shape == (10, 4)
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        assert np.all(pos.value[:, 0, 0] == np.arange(10))
+        assert np.all(pos.step[:] == 10*np.arange(10))
+        assert np.allclose(pos.time[:], 0.5*np.arange(10))
+        assert pyh5md.element(g, 'velocity').value.shape == (10, 4, 3)
+
+
+def test_buffered_linear_element_flush(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        obs = pyh5md.element(f, 'observables/x', store='linear', data=0.,
+                             step=5, buffer_frames=100)
+        for i in range(7):
+            obs.append(float(i))
+        assert obs.value.shape == (0,)
+        f.flush()
+        assert np.all(obs.value[:] == np.arange(7))
@@ -0,0 +1,43 @@
+import pyh5md
+import numpy as np
+
+
+def test_elements(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(5, 3),
+                             dtype=np.float32, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(5, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        pyh5md.element(g, 'mass', store='fixed', data=np.ones(5))
+        assert list(f.elements()) == ['particles/atoms/mass',
+                                      'particles/atoms/position',
+                                      'particles/atoms/velocity']
+        assert f.elements() is f.elements()
+        # creating an element resets the catalogue
+        pyh5md.element(f, 'observables/e', store='linear', data=0., step=10,
+                       step_offset=5, time=1.)
+        assert 'observables/e' in f.elements()
+        for i in range(3):
+            pos.append(np.zeros((5, 3)), i, i)
+
+    with pyh5md.File(fname, 'r') as f:
+        elements = f.elements()
+        pos = elements['particles/atoms/position']
+        assert pos.element_type == 'TimeElement'
+        assert pos.shape == (3, 5, 3)
+        assert pos.dtype == np.float32
+        vel = elements['particles/atoms/velocity']
+        assert vel.step == pos.step
+        assert vel.time == pos.time
+        e = elements['observables/e']
+        assert e.element_type == 'LinearElement'
+        assert (e.step, e.step_offset, e.time, e.time_offset) == (10, 5, 1., None)
+        assert elements['particles/atoms/mass'].element_type == 'FixedElement'
+
+        group = f.particles_group('atoms').elements()
+        assert sorted(group) == ['mass', 'position', 'velocity']
+        assert group['position'].name == 'position'
+        assert pyh5md.element(f, 'particles/atoms/position') is \
+            pyh5md.element(f.particles_group('atoms'), 'position')
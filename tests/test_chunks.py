@@ -0,0 +1,51 @@
+import pyh5md
+from pyh5md.h5md_module import chunk_shape, chunk_cache, default_chunks, CHUNK_BYTES
+import numpy as np
+
+
+def test_chunk_shape_layouts():
+    shape = (0, 1000000, 3)
+    frames = chunk_shape(shape, np.float64, 'frames')
+    assert frames[2] == 3
+    assert np.prod(frames)*8 <= CHUNK_BYTES
+    series = chunk_shape(shape, np.float64, 'series')
+    assert series[0] > series[1]
+    assert series[2] == 3
+    small = chunk_shape((0, 100, 3), np.float64, 'frames')
+    assert small[1:] == (100, 3)
+    assert small[0]*100*3*8 <= CHUNK_BYTES
+    assert chunk_shape((0,), np.float64, 'auto', nbytes=8*100) == (100,)
+
+
+def test_element_chunks(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(100, 3),
+                             dtype=np.float64, chunks='frames')
+        assert pos.value.chunks == chunk_shape((0, 100, 3), np.float64, 'frames')
+        cache = pos.value.id.get_access_plist().get_chunk_cache()
+        assert cache[1] >= 1024**2
+        vel = pyh5md.element(g, 'velocity', store='time', data=np.zeros((100, 3)),
+                             chunks='series', chunk_bytes=64*1024)
+        assert vel.value.chunks == chunk_shape((0, 100, 3), np.float64, 'series', 64*1024)
+        force = pyh5md.element(g, 'force', store='time', shape=(100, 3),
+                               dtype=np.float64, chunks=(4, 100, 3))
+        assert force.value.chunks == (4, 100, 3)
+        ids = pyh5md.element(g, 'id', store='time', shape=(100,), dtype=int)
+        assert ids.value.chunks == default_chunks((0, 100))
+
+
+def test_reopen_chunk_cache(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                       shape=(10000, 3), dtype=np.float64, chunks='auto')
+    with pyh5md.File(fname, 'r') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        cache = chunk_cache(pos.value.shape, pos.value.chunks, pos.value.dtype)
+        assert cache['rdcc_nbytes'] > 1024**2
+        assert pos.value.id.get_access_plist().get_chunk_cache()[1] == cache['rdcc_nbytes']
+    with pyh5md.File(fname, 'r', element_chunk_cache=False) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        assert pos.value.id.get_access_plist().get_chunk_cache()[1] == \
+            f.id.get_access_plist().get_cache()[2]
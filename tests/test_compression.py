@@ -0,0 +1,48 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('preset', ['fast', 'small'])
+def test_compression_presets(tmpdir, preset):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(10, 3),
+                             dtype=np.float64, time=True, compression=preset)
+        g.create_box(dimension=3, boundary=['none']*3, store='time',
+                     data=np.ones(3), time=True, compression=preset)
+        pyh5md.element(g, 'mass', store='fixed', data=np.ones(10),
+                       compression=preset)
+        pyh5md.element(f, 'observables/n', store='fixed', data=10,
+                       compression=preset)
+        for i in range(5):
+            pos.append(np.full((10, 3), i), i, 0.1*i)
+            g.box.edges.append(np.ones(3), i, 0.1*i)
+
+    expected = {'fast': 'lzf', 'small': 'gzip'}[preset]
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        edges = pyh5md.element(g, 'box/edges')
+        for dset in [pos.value, pos.step, pos.time, edges.value, edges.step,
+                     edges.time, g['mass']]:
+            assert dset.compression == expected
+            assert dset.shuffle
+        assert np.all(pos.value[:, 0, 0] == np.arange(5))
+
+
+def test_compression_plugin(tmpdir):
+    pytest.importorskip('hdf5plugin')
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        obs = pyh5md.element(f, 'observables/e', store='time', shape=(),
+                             dtype=np.float64, compression='zstd')
+        obs.append(1., 0)
+        assert obs.value.shape == (1,)
+        assert '32015' in obs.value._filters
+
+
+def test_compression_unknown_plugin(monkeypatch):
+    monkeypatch.setattr(pyh5md.h5md_module, 'hdf5plugin', None)
+    with pytest.raises(ValueError):
+        pyh5md.h5md_module.compression_filters('zstd')
@@ -0,0 +1,103 @@
+import os
+import pyh5md
+import numpy as np
+import pytest
+
+
+def _segment(fname, steps, mass=1.):
+    with pyh5md.File(fname, 'w', creator='test_concat') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4, 3),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(4, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        pyh5md.element(g, 'mass', store='fixed', data=np.full(4, mass))
+        e = pyh5md.element(f, 'observables/e', store='linear', data=0., step=1,
+                           step_offset=steps[0], time=0.1, time_offset=0.1*steps[0])
+        e.attrs['particles_group'] = g.ref
+        for i in steps:
+            g.append_frame(i, 0.1*i, position=np.full((4, 3), i), velocity=np.full((4, 3), -i))
+            e.append(float(i))
+
+
+def test_concat(tmpdir):
+    run = tmpdir.mkdir('run')
+    names = [str(run.join('segment%d.h5' % i)) for i in range(3)]
+    # the second segment restarts from a checkpoint at step 8
+    for name, steps in zip(names, [range(10), range(8, 16), range(16, 20)]):
+        _segment(name, steps)
+    out = str(tmpdir.join('run.h5'))
+    pyh5md.concat(names, out)
+
+    cwd = os.getcwd()
+    os.chdir(str(tmpdir.mkdir('elsewhere')))
+    try:
+        with pyh5md.File(out, 'r') as f:
+            assert f['h5md/creator'].attrs['name'] == 'test_concat'
+            g = f.particles_group('atoms')
+            pos = pyh5md.element(g, 'position')
+            assert pos.value.is_virtual
+            assert np.all(pos.step[:] == np.arange(20))
+            assert np.allclose(pos.time[:], 0.1*np.arange(20))
+            assert np.all(pos.value[:, 0, 0] == np.arange(20))
+            vel = pyh5md.element(g, 'velocity')
+            assert vel.step.id == pos.step.id
+            assert np.all(vel.get_by_step(12) == -12)
+            assert np.all(pyh5md.element(g, 'mass')[()] == 1)
+            e = pyh5md.element(f, 'observables/e')
+            assert np.all(e.value[:] == np.arange(20))
+            assert e.get_by_step(15) == 15
+            assert f[e.attrs['particles_group']] == g
+    finally:
+        os.chdir(cwd)
+
+
+def test_concat_replaced_segment(tmpdir):
+    # the second segment restarts before the first one and replaces it
+    names = [str(tmpdir.join('segment%d.h5' % i)) for i in range(2)]
+    _segment(names[0], range(5, 15))
+    _segment(names[1], range(3, 20))
+    out = str(tmpdir.join('run.h5'))
+    pyh5md.concat(names, out)
+    with pyh5md.File(out, 'r') as f:
+        e = pyh5md.element(f, 'observables/e')
+        assert (e.step, e.step_offset) == (1, 3)
+        assert np.isclose(e.time_offset, 0.3)
+        assert np.all(e.value[:] == np.arange(3, 20))
+        assert e.get_by_step(5) == 5
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        assert np.all(pos.step[:] == np.arange(3, 20))
+
+
+def test_concat_new_element(tmpdir):
+    names = [str(tmpdir.join('segment%d.h5' % i)) for i in range(2)]
+    _segment(names[0], range(10))
+    _segment(names[1], range(10, 20))
+    # the second segment adds an observable and a fixed element
+    with pyh5md.File(names[1], 'a') as f:
+        new = pyh5md.element(f, 'observables/new', store='time', shape=(2,), dtype=np.float64)
+        for i in range(10, 20):
+            new.append(np.full(2, i), i)
+    out = str(tmpdir.join('run.h5'))
+    pyh5md.concat(names, out)
+    with pyh5md.File(out, 'r') as f:
+        new = pyh5md.element(f, 'observables/new')
+        assert np.all(new.step[:] == np.arange(10, 20))
+        assert np.all(new.value[:, 0] == np.arange(10, 20))
+        assert np.all(pyh5md.element(f, 'observables/e').value[:] == np.arange(20))
+    with pyh5md.File(names[1], 'a') as f:
+        pyh5md.element(f, 'observables/charge', store='fixed', data=np.zeros(4))
+    with pytest.raises(ValueError):
+        pyh5md.concat(names, out)
+
+
+def test_concat_errors(tmpdir):
+    names = [str(tmpdir.join('segment%d.h5' % i)) for i in range(2)]
+    _segment(names[0], range(10))
+    _segment(names[1], range(10, 20), mass=2.)
+    with pytest.raises(ValueError):
+        pyh5md.concat(names, str(tmpdir.join('run.h5')))
+    # the linear element misses the steps 10 and 11
+    _segment(names[1], range(12, 20))
+    with pytest.raises(ValueError):
+        pyh5md.concat(names, str(tmpdir.join('run.h5')))
@@ -0,0 +1,64 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def trajectory(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, 'w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(64, 3),
+                             dtype=np.float64, time=True, chunks=(8, 16, 3), growth=2)
+        pyh5md.element(g, 'mass', store='fixed', data=np.arange(64.))
+        pyh5md.element(g, 'inertia', store='fixed', data=np.eye(3))
+        e = pyh5md.element(f, 'observables/e', store='linear', data=0., step=10,
+                           step_offset=5, time=0.5)
+        for i in range(50):
+            pos.append(np.full((64, 3), i), 10*i, 0.1*i)
+            e.append(float(i))
+    return fname
+
+
+def test_to_dask(trajectory):
+    pytest.importorskip('dask')
+    with pyh5md.File(trajectory, 'r') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        x = pos.to_dask()
+        assert x.shape == (50, 64, 3)
+        assert x.chunks[0] == (8,)*6 + (2,)
+        assert x.chunks[1] == (16,)*4
+        assert pos.to_dask(block=20).chunks[0] == (24, 24, 2)
+        assert np.all(x.mean(axis=(1, 2)).compute() == np.arange(50))
+
+
+def test_to_xarray(trajectory):
+    pytest.importorskip('dask')
+    pytest.importorskip('xarray')
+    with pyh5md.File(trajectory, 'r') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        x = pos.to_xarray()
+        assert x.dims == ('step', 'particle', 'component')
+        assert np.all(x.step == 10*np.arange(50))
+        assert np.allclose(x.time, 0.1*np.arange(50))
+        assert float(x.sel(step=120).mean()) == 12
+        e = pyh5md.element(f, 'observables/e').to_xarray()
+        assert e.dims == ('step',)
+        assert np.all(e.step == 5 + 10*np.arange(50))
+        assert np.allclose(e.time, 0.5*np.arange(50))
+        assert float(e.sel(step=25)) == 2
+
+
+def test_fixed(trajectory):
+    pytest.importorskip('dask')
+    pytest.importorskip('xarray')
+    with pyh5md.File(trajectory, 'r') as f:
+        g = f.particles_group('atoms')
+        mass = pyh5md.element(g, 'mass')
+        assert np.all(mass.to_dask().compute() == np.arange(64))
+        x = mass.to_xarray()
+        assert x.dims == ('particle',) and x.name == 'mass'
+        assert float(x.sum()) == np.arange(64).sum()
+        inertia = pyh5md.element(g, 'inertia').to_xarray(dims=('i', 'j'))
+        assert inertia.dims == ('i', 'j')
+        assert np.all(inertia.values == np.eye(3))
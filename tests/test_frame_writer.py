@@ -0,0 +1,32 @@
+import pyh5md
+import numpy as np
+
+
+def test_append_frame(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(5, 3),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(5, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        pyh5md.element(g, 'force', store='time', shape=(5, 3),
+                       dtype=np.float64, step_from=pos, buffer_frames=4)
+        g.create_box(dimension=3, boundary=['none']*3, store='time',
+                     shape=(3,), dtype=np.float64, step_from=pos, time=True)
+        assert pyh5md.element(g, 'position') is pos
+        for i in range(10):
+            r = np.full((5, 3), i)
+            g.append_frame(10*i, 0.5*i, position=r, velocity=-r, force=2*r,
+                           box=np.ones(3)*i)
+        assert pos.value.shape[0] == 10
+        assert pos.step.shape[0] == 10
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        for name, factor in [('position', 1), ('velocity', -1), ('force', 2)]:
+            e = pyh5md.element(g, name)
+            assert np.all(e.value[:, 0, 0] == factor*np.arange(10))
+            assert np.all(e.step[:] == 10*np.arange(10))
+        assert np.allclose(pyh5md.element(g, 'velocity').time[:], 0.5*np.arange(10))
+        assert np.all(pyh5md.element(g, 'box/edges').value[:, 0] == np.arange(10))
@@ -0,0 +1,47 @@
+import pyh5md
+import numpy as np
+
+
+def test_expected_frames(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4, 3),
+                             dtype=np.float64, time=True, expected_frames=100)
+        for i in range(10):
+            pos.append(np.full((4, 3), i), i, 0.1*i)
+        # a single resize reserved room for the expected frames
+        assert pos.value.shape[0] == 100
+        assert pos.step.shape[0] == 100
+        assert pos.get_by_idx(slice(None)).shape == (10, 4, 3)
+        f.flush()
+        assert pos.value.shape[0] == 10
+        assert pos.time.shape[0] == 10
+        pos.append(np.full((4, 3), 10), 10, 1.)
+
+    with pyh5md.File(fname, 'r') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        assert pos.value.shape == (11, 4, 3)
+        assert np.all(pos.step[:] == np.arange(11))
+
+
+def test_geometric_growth(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        obs = pyh5md.element(f, 'observables/e', store='time', shape=(),
+                             dtype=np.float64, growth=2)
+        sizes = set()
+        for i in range(300):
+            obs.append(float(i), i)
+            sizes.add(obs.value.shape[0])
+        assert len(sizes) <= 10
+        assert obs.get_by_idx(-1) == 299
+        pos = pyh5md.element(f, 'observables/r', store='time', shape=(4, 3),
+                             dtype=np.float64, growth=2)
+        for i in range(3):
+            pos.append(np.full((4, 3), i), i)
+        assert pos.value.shape[0] == 4
+        assert pos.get_by_idx((1, 2)).shape == (3,)
+        assert np.all(pos.get_by_idx((slice(None), 0, 0)) == [0, 1, 2])
+        obs.flush()
+        assert obs.value.shape == (300,)
+        assert np.all(obs.step[:] == np.arange(300))
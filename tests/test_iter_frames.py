@@ -0,0 +1,27 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_iter_frames(tmpdir, prefetch):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position',
+                             store='time', shape=(4, 3), dtype=np.float64,
+                             time=True, chunks=(8, 4, 3))
+        for i in range(100):
+            pos.append(np.full((4, 3), i), 10*i, 0.5*i)
+
+        blocks = list(pos.iter_frames(3, 95, 2, block=10, prefetch=prefetch))
+        steps = np.concatenate([b[0] for b in blocks])
+        times = np.concatenate([b[1] for b in blocks])
+        value = np.concatenate([b[2] for b in blocks])
+        assert np.all(value[:, 0, 0] == np.arange(3, 95, 2))
+        assert np.all(steps == 10*np.arange(3, 95, 2))
+        assert np.allclose(times, 0.5*np.arange(3, 95, 2))
+        # blocks of 16 frames aligned on the chunks
+        for step, time, value in blocks:
+            assert len(set(value[:, 0, 0].astype(int)//16)) == 1
+
+        assert sum(len(b[2]) for b in pos.iter_frames()) == 100
+        assert list(pos.iter_frames(50, 10)) == []
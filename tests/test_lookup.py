@@ -0,0 +1,45 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+def test_time_element_lookup(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(2,),
+                             dtype=np.float64, time=True, buffer_frames=7)
+        vel = pyh5md.element(g, 'velocity', store='time', shape=(2,),
+                             dtype=np.float64, step_from=pos, time=True)
+        for i in range(20):
+            pos.append([i, i], 5*i, 0.25*i)
+            vel.append([-i, -i], 5*i, 0.25*i)
+            # the index of vel is built on the steps buffered by pos
+            assert vel.get_by_step(5*i)[0] == -i
+        assert pos.get_by_step(35)[0] == 7
+        with pytest.raises(KeyError):
+            pos.get_by_step(36)
+        assert pos.get_by_time(1.1)[0] == 4
+        assert pos.get_by_time(100.)[0] == 19
+        assert np.all(pos.slice_steps(12, 30)[:, 0] == [3, 4, 5])
+        assert np.all(vel.slice_times(1., 1.5)[:, 0] == [-4, -5])
+        assert len(pos.slice_steps(200, 300)) == 0
+
+
+def test_linear_element_lookup(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        obs = pyh5md.element(f, 'observables/x', store='linear', data=0.,
+                             step=10, step_offset=5, time=0.5, time_offset=1.)
+        assert obs.step_offset == 5
+        for i in range(10):
+            obs.append(float(i))
+    with pyh5md.File(fname, 'r') as f:
+        obs = pyh5md.element(f, 'observables/x')
+        assert obs.get_by_step(45) == 4
+        with pytest.raises(KeyError):
+            obs.get_by_step(40)
+        with pytest.raises(KeyError):
+            obs.get_by_step(105)
+        assert obs.get_by_time(2.6) == 3
+        assert np.all(obs.slice_steps(10, 36) == [1, 2, 3])
+        assert np.all(obs.slice_times(1.5, 3.) == [1, 2, 3])
@@ -0,0 +1,62 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+def test_memmap(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pyh5md.element(g, 'mass', store='fixed', data=np.arange(10.),
+                       contiguous=True)
+        species = pyh5md.element(g, 'species', store='fixed', shape=(10,),
+                                 dtype=np.int32, contiguous=True)
+        species[:] = 3
+        pyh5md.element(g, 'charge', store='fixed', data=np.ones(10),
+                       compression='fast')
+        pos = pyh5md.element(g, 'position', store='time', shape=(5,),
+                             dtype=np.float64, chunks=(10, 5))
+        vel = pyh5md.element(g, 'velocity', store='time', shape=(5,),
+                             dtype=np.float64, chunks=(4, 5))
+        for i in range(10):
+            pos.append(np.full(5, i), i)
+            vel.append(np.full(5, i), i)
+        with pytest.raises(ValueError):
+            pyh5md.element(g, 'id', store='fixed', data=np.arange(10),
+                           contiguous=True, compression='fast')
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        mass = pyh5md.element(g, 'mass').as_memmap()
+        assert isinstance(mass, np.memmap)
+        assert np.all(mass == np.arange(10.))
+        assert not mass.flags.writeable
+        assert np.all(pyh5md.element(g, 'species').as_memmap() == 3)
+        charge = pyh5md.element(g, 'charge').as_memmap()
+        assert not isinstance(charge, np.memmap)
+        assert np.all(charge == 1)
+        # a single chunk spanning the dataset is mapped
+        pos = pyh5md.element(g, 'position').as_memmap()
+        assert isinstance(pos, np.memmap)
+        assert np.all(pos[:, 0] == np.arange(10))
+        vel = pyh5md.element(g, 'velocity').as_memmap()
+        assert not isinstance(vel, np.memmap)
+        assert np.all(vel[:, 0] == np.arange(10))
+
+
+def test_memmap_write_session(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        mass = pyh5md.element(g, 'mass', store='fixed', data=np.arange(1000.),
+                              contiguous=True)
+        assert np.all(mass.as_memmap() == np.arange(1000.))
+        species = pyh5md.element(g, 'species', store='fixed', shape=(1000,),
+                                 dtype=np.int32, contiguous=True)
+        species[:] = 7
+        assert np.all(species.as_memmap() == 7)
+    with pyh5md.File(fname, 'a') as f:
+        species = pyh5md.element(f.particles_group('atoms'), 'species')
+        species[:10] = 5
+        m = species.as_memmap()
+        assert np.all(m[:10] == 5) and np.all(m[10:] == 7)
@@ -0,0 +1,39 @@
+import pyh5md
+import numpy as np
+import h5py
+import pytest
+
+
+def test_mpi_writer_requires_mpio(tmpdir):
+    with pytest.raises(ValueError):
+        pyh5md.File(str(tmpdir.join('test.h5')), 'w', writer='mpi')
+    with pyh5md.File(str(tmpdir.join('test.h5')), 'w') as f:
+        with pytest.raises(ValueError):
+            f.mpi_region(10)
+
+
+@pytest.mark.skipif(not h5py.get_config().mpi, reason='h5py without MPI')
+def test_mpi_writer(tmpdir):
+    MPI = pytest.importorskip('mpi4py.MPI')
+    comm = MPI.COMM_WORLD
+    fname = comm.bcast(str(tmpdir.join('test.h5')))
+    n = 4 + comm.rank
+    with pyh5md.File(fname, 'w', driver='mpio', comm=comm, writer='mpi') as f:
+        region, total = f.mpi_region(n)
+        assert total == sum(4 + i for i in range(comm.size))
+        assert region == (sum(4 + i for i in range(comm.rank)), region[0] + n)
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(total, 3),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(total, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        for i in range(10):
+            g.append_frame(i, 0.1*i, region=region, collective=True,
+                           position=np.full((n, 3), comm.rank),
+                           velocity=np.full((n, 3), i))
+
+    with pyh5md.File(fname, 'r', driver='mpio', comm=comm) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        assert pos.value.shape == (10, total, 3)
+        assert np.all(pos.step[:] == np.arange(10))
+        assert np.all(pos.value[:, region[0]:region[1]] == comm.rank)
@@ -0,0 +1,45 @@
+import operator
+import pyh5md
+from pyh5md.parallel import map_frames
+import numpy as np
+
+
+def frame_sum(step, time, value):
+    return step, time, value.sum()
+
+
+def frame_total(step, time, value):
+    return value.sum()
+
+
+def test_map_frames(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position',
+                             store='time', shape=(4, 3), dtype=np.float64,
+                             time=True, chunks=(8, 4, 3))
+        for i in range(50):
+            pos.append(np.full((4, 3), i), 10*i, 0.5*i)
+
+    results = list(map_frames(fname, 'particles/atoms/position', frame_sum,
+                              frames=slice(3, 45, 2), workers=2))
+    assert [r[0] for r in results] == list(range(30, 450, 20))
+    assert np.allclose([r[1] for r in results], 0.5*np.arange(3, 45, 2))
+    assert np.allclose([r[2] for r in results], 12*np.arange(3, 45, 2))
+
+    total = map_frames(fname, 'particles/atoms/position', frame_total,
+                       workers=2, reduce=operator.add, shard_frames=10)
+    assert total == 12*np.arange(50).sum()
+
+    # blocks of a single chunk within the shards
+    results = list(map_frames(fname, 'particles/atoms/position', frame_sum,
+                              frames=slice(1, 50, 3), workers=2, shard_frames=24,
+                              max_bytes=8*12))
+    assert [r[0] for r in results] == list(range(10, 500, 30))
+    assert np.allclose([r[2] for r in results], 12*np.arange(1, 50, 3))
+
+    # no frame selected
+    assert map_frames(fname, 'particles/atoms/position', frame_total, frames=slice(5, 5),
+                      reduce=operator.add) is None
+    assert list(map_frames(fname, 'particles/atoms/position', frame_total,
+                           frames=slice(5, 5))) == []
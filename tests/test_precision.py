@@ -0,0 +1,40 @@
+import pyh5md
+from pyh5md.h5md_module import precision_digits
+import numpy as np
+import pytest
+
+
+def test_precision_digits():
+    assert precision_digits(1e-3) == 3
+    assert precision_digits(2e-3) == 3
+    assert precision_digits(0.5) == 1
+    assert precision_digits(10) == 0
+
+
+def test_quantized_elements(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    r = np.random.random((200, 3))*50
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', data=r, time=True,
+                             chunks=(10, 200, 3), precision=1e-3)
+        pyh5md.element(g, 'mass', store='fixed', data=r[:, 0], precision=1e-2)
+        for i in range(20):
+            pos.append(r + i, i, 0.1*i)
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        value = pos.value[:]
+        assert value.dtype == r.dtype
+        assert np.abs(value - (r + np.arange(20).reshape((-1, 1, 1)))).max() < 1e-3
+        assert pos.value.id.get_storage_size() < value.nbytes/2
+        mass = pyh5md.element(g, 'mass')
+        assert np.abs(mass.value[:] - r[:, 0]).max() < 1e-2
+
+
+def test_precision_integer(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        with pytest.raises(ValueError):
+            pyh5md.element(f.particles_group('atoms'), 'id', store='time',
+                           shape=(10,), dtype=int, precision=1)
@@ -0,0 +1,40 @@
+import pyh5md
+from pyh5md.h5md_module import chunk_cache
+import numpy as np
+import h5py
+import pytest
+
+
+def _write(fname, **kwargs):
+    with pyh5md.File(fname, 'w', **kwargs) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=(1000, 3), dtype=np.float64, chunks=(16, 1000, 3))
+        for i in range(20):
+            pos.append(np.full((1000, 3), i), i)
+        fcpl = f.id.get_create_plist()
+        return fcpl.get_file_space_strategy()[0], f.id.get_access_plist().get_alignment()
+
+
+def test_profiles(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    strategy, alignment = _write(fname, profile='write-stream')
+    assert strategy == h5py.h5f.FSPACE_STRATEGY_PAGE
+    strategy, alignment = _write(fname, profile='parallel-fs', alignment_interval=4096)
+    assert alignment == (1024**2, 4096)
+
+    with pyh5md.File(fname, 'r', profile='read-analysis') as f:
+        assert f.id.get_access_plist().get_cache()[2] == pyh5md.h5md_module.CHUNK_CACHE_MAX
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        cache = chunk_cache(pos.value.shape, pos.value.chunks, pos.value.dtype)
+        assert pos.value.id.get_access_plist().get_chunk_cache() == \
+            (cache['rdcc_nslots'], cache['rdcc_nbytes'], cache['rdcc_w0'])
+        assert np.all(pos.value[:, 0, 0] == np.arange(20))
+
+    with pyh5md.File(fname, 'r', profile='read-analysis', rdcc_nbytes=1024**2,
+                     element_chunk_cache=False) as f:
+        assert f.id.get_access_plist().get_cache()[2] == 1024**2
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        assert pos.value.id.get_access_plist().get_chunk_cache()[1] == 1024**2
+
+    with pytest.raises(ValueError):
+        pyh5md.File(fname, 'r', profile='fast')
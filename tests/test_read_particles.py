@@ -0,0 +1,83 @@
+import pyh5md
+import numpy as np
+import pytest
+import tracemalloc
+
+
+def test_read_particles(tmpdir):
+    N = 500
+    r = np.random.random((30, N, 3))
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(N, 3),
+                             dtype=np.float64, chunks=(8, 16, 3))
+        # particles are stored in a different order in each frame
+        ids = pyh5md.element(g, 'id', store='time', shape=(N,), dtype=int,
+                             step_from=pos)
+        permutations = [np.random.permutation(N) for i in range(30)]
+        for i in range(30):
+            pos.append(r[i][permutations[i]], i)
+            ids.append(permutations[i], i)
+
+        value = pos.value[:]
+        indices = np.array([400, 3, 17, 3, 250, 16, -1, 499, 0])
+        assert np.all(pos.read_particles(indices) == value[:, indices])
+        assert np.all(pos.read_particles(indices, frames=slice(2, 20, 3)) ==
+                      value[2:20:3][:, indices])
+        assert pos.read_particles([], frames=slice(0, 5)).shape == (5, 0, 3)
+
+        tagged = np.array([42, 7, 300, 7])
+        assert np.all(pos.read_particles(ids=tagged) == r[:, tagged])
+        assert np.all(pos.read_particles(ids=tagged, frames=slice(5, 9)) ==
+                      r[5:9][:, tagged])
+        with pytest.raises(KeyError):
+            pos.read_particles(ids=[N+1])
+
+        # blocks of one chunk of frames, and runs of at most READ_RUN_CHUNKS chunks
+        frame_bytes = N*3*8
+        indices = np.arange(0, N, 3)
+        frames = slice(1, 29, 2)
+        assert np.all(pos.read_particles(indices, frames=frames, max_bytes=frame_bytes) ==
+                      value[frames][:, indices])
+        assert np.all(pos.read_particles(ids=tagged, frames=frames, max_bytes=frame_bytes) ==
+                      r[frames][:, tagged])
+
+
+def test_read_particles_memory(tmpdir):
+    N = 5000
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=(N, 3), dtype=np.float64, chunks=(8, 128, 3))
+        for i in range(200):
+            pos.append(np.full((N, 3), i), i)
+        indices = np.sort(np.random.choice(N, 100, replace=False))
+        max_bytes = 8*N*3*8
+        tracemalloc.start()
+        result = pos.read_particles(indices, max_bytes=max_bytes)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert np.all(result[:, :, 0] == np.arange(200).reshape((-1, 1)))
+        # the peak does not grow with the number of frames
+        assert peak < result.nbytes + 2*max_bytes
+
+
+def test_read_particles_fixed_id(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        g = f.particles_group('atoms')
+        pyh5md.element(g, 'id', store='fixed', data=np.arange(10)[::-1]*10)
+        pos = pyh5md.element(g, 'position', store='time', shape=(10,),
+                             dtype=np.float64)
+        for i in range(4):
+            pos.append(np.arange(10.) + i, i)
+        assert np.all(pos.read_particles(ids=[90, 0])[:, 0] == np.arange(4))
+        assert np.all(pos.read_particles(ids=[90, 0])[:, 1] == 9 + np.arange(4))
+
+
+def test_read_particles_no_id(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=(10,), dtype=np.float64)
+        pos.append(np.arange(10.), 0)
+        with pytest.raises(KeyError, match='id element not found'):
+            pos.read_particles(ids=[1])
+        assert 'id' not in f['particles/atoms']
@@ -0,0 +1,85 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'buffer_frames': 2}])
+@pytest.mark.parametrize('file_kwargs', [{}, {'writer': 'async'}])
+def test_reduce(tmpdir, kwargs, file_kwargs):
+    fname = str(tmpdir.join('test.h5'))
+    x = np.random.normal(size=(25, 3)) + 1e6
+    with pyh5md.File(fname, mode='w', **file_kwargs) as f:
+        obs = pyh5md.element(f, 'observables/x', store='reduce', every=10, shape=(3,),
+                             time=True, bins=4, range=(1e6-2, 1e6+2), **kwargs)
+        for i, v in enumerate(x):
+            obs.append(v, i, 0.1*i)
+
+    with pyh5md.File(fname, 'r') as f:
+        obs = pyh5md.element(f, 'observables/x')
+        assert obs.element_type == 'ReducingElement'
+        rec = obs.records
+        assert np.all(rec['count'].value[:] == [10, 10, 5])
+        assert np.all(rec['mean'].step[:] == [9, 19, 24])
+        assert np.allclose(rec['max'].time[:], [0.9, 1.9, 2.4])
+        blocks = [x[0:10], x[10:20], x[20:25]]
+        assert np.allclose(rec['mean'].value[:], [b.mean(axis=0) for b in blocks],
+                           rtol=0, atol=1e-9)
+        assert np.allclose(rec['variance'].value[:], [b.var(axis=0) for b in blocks])
+        assert np.all(rec['min'].value[:] == [b.min(axis=0) for b in blocks])
+        assert np.all(rec['max'].value[:] == [b.max(axis=0) for b in blocks])
+        edges = f['observables/x/bin_edges'][()]
+        assert np.all(rec['histogram'].value[:] == [np.histogram(b, edges)[0] for b in blocks])
+
+
+def test_reduce_reopen(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        obs = pyh5md.element(f, 'observables/e', store='reduce', every=4,
+                             reduce=('mean', 'max'), dtype=np.int32)
+        for i in range(8):
+            obs.append(i, i)
+        assert sorted(obs.records) == ['count', 'max', 'mean']
+        assert obs.records['max'].value.dtype == np.int32
+
+    with pyh5md.File(fname, 'a') as f:
+        obs = pyh5md.element(f, 'observables/e')
+        with pytest.raises(ValueError):
+            obs.append(8, 8)
+    with pyh5md.File(fname, 'a') as f:
+        pyh5md.element(f, 'observables/e')
+        obs = pyh5md.element(f, 'observables/e', every=4)
+        for i in range(8, 12):
+            obs.append(i, i)
+        assert np.all(obs.records['mean'].value[:] == [1.5, 5.5, 9.5])
+        assert np.all(obs.records['max'].value[:] == [3, 7, 11])
+        assert np.all(obs.records['count'].step[:] == [3, 7, 11])
+
+
+def test_reduce_reopen_histogram(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    x = np.arange(30).reshape(10, 3) % 4
+    with pyh5md.File(fname, mode='w') as f:
+        obs = pyh5md.element(f, 'observables/h', store='reduce', every=5, shape=(3,),
+                             dtype=np.int32, reduce=('histogram',), bins=4, range=(0, 4))
+        for i in range(5):
+            obs.append(x[i], i)
+
+    with pyh5md.File(fname, 'a') as f:
+        obs = pyh5md.element(f, 'observables/h', every=5)
+        assert obs.shape == (3,) and obs.dtype == np.int32
+        for i in range(5, 10):
+            obs.append(x[i], i)
+        hist = obs.records['histogram'].value[:]
+        assert np.all(hist == [np.bincount(x[:5].ravel()), np.bincount(x[5:].ravel())])
+
+
+def test_reduce_errors(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        with pytest.raises(ValueError):
+            pyh5md.element(f, 'a', store='reduce', every=10, reduce=('median',))
+        with pytest.raises(ValueError):
+            pyh5md.element(f, 'b', store='reduce', every=10, reduce=('histogram',), bins=4)
+        obs = pyh5md.element(f, 'c', store='reduce', every=10, shape=(2,))
+        with pytest.raises(ValueError):
+            obs.append(1., 0)
+        assert 'a' not in f and 'b' not in f
@@ -0,0 +1,74 @@
+import pyh5md
+from pyh5md.repack import main, repack
+import numpy as np
+import h5py
+import pytest
+
+
+@pytest.fixture
+def source(tmpdir):
+    fname = str(tmpdir.join('source.h5'))
+    with pyh5md.File(fname, 'w', creator='test_repack', author='Someone') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(50, 3),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(50, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        pyh5md.element(g, 'mass', store='fixed', data=np.ones(50))
+        e = pyh5md.element(f, 'observables/e', store='linear', data=0., step=10, time=0.5)
+        e.attrs['particles_group'] = g.ref
+        for i in range(20):
+            g.append_frame(i, 0.1*i, position=np.full((50, 3), i), velocity=np.full((50, 3), -i))
+            e.append(float(i))
+    return fname
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repack(source, tmpdir, workers):
+    target = str(tmpdir.join('target.h5'))
+    repack(source, target, chunks='frames', compression='small', dtype='float32',
+           frames=slice(1, None, 3), max_bytes=2000, workers=workers)
+    with pyh5md.File(target, 'r') as f:
+        assert f['h5md/creator'].attrs['name'] == 'test_repack'
+        assert f['h5md/author'].attrs['name'] == 'Someone'
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        assert pos.value.dtype == np.float32
+        assert pos.value.compression == 'gzip'
+        assert np.all(pos.value[:, 0, 0] == np.arange(1, 20, 3))
+        assert np.all(pos.step[:] == np.arange(1, 20, 3))
+        assert np.allclose(pos.time[:], 0.1*np.arange(1, 20, 3))
+        vel = pyh5md.element(g, 'velocity')
+        assert vel.step.id == pos.step.id
+        assert np.all(vel.value[:, 0, 0] == -np.arange(1, 20, 3))
+        assert np.all(pyh5md.element(g, 'mass')[()] == 1)
+        e = pyh5md.element(f, 'observables/e')
+        assert np.all(e.value[:] == np.arange(1, 20, 3))
+        assert (e.step, e.step_offset, e.time, e.time_offset) == (30, 10, 1.5, 0.5)
+        assert f[e.attrs['particles_group']] == g
+
+
+def test_repack_main(source, tmpdir):
+    target = str(tmpdir.join('target.h5'))
+    main([source, target, '--chunks', 'series', '--stop', '5'])
+    with h5py.File(source, 'r') as src, h5py.File(target, 'r') as dst:
+        a, b = src['particles/atoms/position/value'], dst['particles/atoms/position/value']
+        assert np.all(a[:5] == b[:])
+        assert b.chunks[0] > a.chunks[0]
+
+
+def test_repack_keeps_filters(tmpdir):
+    source, target = str(tmpdir.join('source.h5')), str(tmpdir.join('target.h5'))
+    with pyh5md.File(source, 'w') as f:
+        x = pyh5md.element(f, 'observables/x', store='time', shape=(10,), dtype=np.float64,
+                           compression='gzip', compression_opts=6, precision=1e-3)
+        for i in range(10):
+            x.append(np.full(10, i/3.), i)
+    repack(source, target, frames=slice(None, None, 2))
+    with h5py.File(source, 'r') as src, h5py.File(target, 'r') as dst:
+        a, b = src['observables/x/value'], dst['observables/x/value']
+        assert (b.compression, b.compression_opts) == ('gzip', 6)
+        assert b.shuffle == a.shuffle
+        assert b.scaleoffset == a.scaleoffset == 3
+        assert b.chunks == a.chunks
+        assert np.allclose(b[:], a[::2], rtol=0, atol=1e-3)
@@ -0,0 +1,140 @@
+import pyh5md
+import numpy as np
+import h5py
+import pytest
+
+
+def _create(fname, n, growth=None):
+    kwargs = {} if growth is None else {'growth': growth}
+    with pyh5md.File(fname, 'w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4, 3),
+                             dtype=np.float64, time=True, **kwargs)
+        pyh5md.element(g, 'velocity', store='time', shape=(4, 3),
+                       dtype=np.float64, step_from=pos, time=True, **kwargs)
+        e = pyh5md.element(f, 'observables/e', store='linear', data=0.,
+                           step=1, step_offset=5)
+        for i in range(n):
+            g.append_frame(10*i, 0.1*i, position=np.full((4, 3), i), velocity=np.full((4, 3), -i))
+            for j in range(10):
+                e.append(float(10*i + j))
+        if growth is not None:
+            # a crash leaves the frames reserved by growth
+            h5py.File.close(f)
+
+
+def _append(f, start, n):
+    g = f.particles_group('atoms')
+    for i in range(start, start+n):
+        g.append_frame(10*i, 0.1*i, position=np.full((4, 3), i), velocity=np.full((4, 3), -i))
+
+
+def _check(fname, n):
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        vel = pyh5md.element(g, 'velocity')
+        assert np.all(pos.step[:] == 10*np.arange(n))
+        assert np.allclose(pos.time[:], 0.1*np.arange(n))
+        assert np.all(pos.value[:, 0, 0] == np.arange(n))
+        assert np.all(vel.value[:, 0, 0] == -np.arange(n))
+
+
+def test_reopen_append(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 3)
+    with pyh5md.File(fname, 'a') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        vel = pyh5md.element(g, 'velocity', buffer_frames=4)
+        assert pos.own_step and not vel.own_step
+        e = pyh5md.element(f, 'observables/e')
+        assert (e.step, e.step_offset) == (1, 5)
+        _append(f, 3, 3)
+    _check(fname, 6)
+
+
+def test_reopen_h5py(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 3)
+    with h5py.File(fname, 'a') as f:
+        g = f['particles/atoms']
+        pos = pyh5md.element(g, 'position')
+        vel = pyh5md.element(g, 'velocity')
+        assert pos.own_step and not vel.own_step
+        for i in range(3, 5):
+            pos.append(np.full((4, 3), i), 10*i, 0.1*i)
+            vel.append(np.full((4, 3), -i), 10*i, 0.1*i)
+    _check(fname, 5)
+
+
+def test_reopen_policy(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 3)
+    with pyh5md.File(fname, 'a') as f:
+        g = f.particles_group('atoms')
+        # reopening velocity caches position, its step owner, without policies
+        pyh5md.element(g, 'velocity')
+        pos = pyh5md.element(g, 'position', buffer_frames=8, growth=2)
+        assert pos._buffer is not None and pos._growth == 2
+        assert pyh5md.element(g, 'position') is pos
+        _append(f, 3, 3)
+        assert f['particles/atoms/position/value'].shape[0] == 3
+    _check(fname, 6)
+
+
+def test_resume(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 5)
+    with h5py.File(fname, 'r+') as f:
+        # the frames of steps 30 and 40 were only partly written
+        f['particles/atoms/velocity/value'].resize(4, axis=0)
+        f['particles/atoms/position/time'].resize(3, axis=0)
+    with pyh5md.File(fname, 'a', resume=True) as f:
+        assert f['particles/atoms/position/value'].shape[0] == 3
+        assert f['particles/atoms/velocity/value'].shape[0] == 3
+        assert f['particles/atoms/position/step'].shape[0] == 3
+        # steps 5 to 20
+        assert f['observables/e/value'].shape[0] == 16
+        _append(f, 3, 2)
+    _check(fname, 5)
+
+
+def test_resume_growth(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 5, growth=2)
+    with h5py.File(fname, 'r') as f:
+        assert f['particles/atoms/position/value'].shape[0] == 8
+    with pyh5md.File(fname, 'a', resume=True) as f:
+        pyh5md.element(f.particles_group('atoms'), 'position', growth=2)
+        _append(f, 5, 10)
+    _check(fname, 15)
+
+
+def test_resume_sampling(tmpdir):
+    # positions every 10 steps, observables every 3 steps and every 20 steps
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, 'w') as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position', store='time',
+                             shape=(), dtype=np.float64)
+        a = pyh5md.element(f, 'observables/a', store='time', shape=(), dtype=np.float64)
+        b = pyh5md.element(f, 'observables/b', store='time', shape=(), dtype=np.float64)
+        for step in range(101):
+            if step % 10 == 0:
+                pos.append(step, step)
+            if step % 3 == 0:
+                a.append(step, step)
+            if step % 20 == 19:
+                b.append(step, step)
+    with pyh5md.File(fname, 'a', resume=True) as f:
+        # cut after step 99, the last step of observables/a and observables/b
+        assert np.all(f['particles/atoms/position/step'][:] == np.arange(0, 91, 10))
+        assert np.all(f['observables/a/step'][:] == np.arange(0, 100, 3))
+        assert np.all(f['observables/b/step'][:] == np.arange(19, 100, 20))
+
+
+def test_resume_mode(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    _create(fname, 1)
+    with pytest.raises(ValueError):
+        pyh5md.File(fname, 'r', resume=True)
@@ -0,0 +1,61 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+def _records(f):
+    return dict(((r['element'], r['operation']), r) for r in f.stats())
+
+
+def test_stats(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    calls = []
+    with pyh5md.File(fname, mode='w', stats_hook=lambda *args: calls.append(args)) as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(8, 3),
+                             dtype=np.float64, time=True, buffer_frames=4)
+        mass = pyh5md.element(g, 'mass', store='fixed', data=np.ones(8))
+        for i in range(10):
+            pos.append(np.zeros((8, 3)), i, 0.1*i)
+        pos.get_by_idx(slice(None))
+        mass[:]
+        f.flush()
+        records = _records(f)
+        assert records['/particles/atoms/position', 'append']['count'] == 10
+        assert records['/particles/atoms/position', 'append']['bytes'] == 10*8*3*8
+        # two full buffers and the remaining frames, value then step and time
+        assert records['/particles/atoms/position', 'write']['count'] == 9
+        assert records['/particles/atoms/position', 'write']['bytes'] == 10*(8*3*8 + 16)
+        assert records['/particles/atoms/position', 'resize']['count'] == 9
+        assert records['/particles/atoms/position', 'read']['bytes'] == 10*8*3*8
+        assert records['/particles/atoms/position', 'flush']['count'] == 1
+        assert records['/particles/atoms/mass', 'read']['bytes'] == 8*8
+        assert records['/', 'flush']['count'] == 1
+        assert all(r['seconds'] >= 0 for r in records.values())
+        assert len(calls) == sum(r['count'] for r in records.values())
+        assert calls[0][:2] == ('/particles/atoms/position', 'append')
+        f.stats(reset=True)
+        assert f.stats() == []
+
+
+def test_stats_frame_writer(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w', stats=True) as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(8, 3),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(8, 3),
+                       dtype=np.float64, step_from=pos, time=True)
+        for i in range(5):
+            g.append_frame(i, 0.1*i, position=np.zeros((8, 3)), velocity=np.ones((8, 3)))
+        records = _records(f)
+        for name in ('position', 'velocity'):
+            assert records['/particles/atoms/'+name, 'append']['count'] == 5
+        # the shared step and time are written once per frame
+        assert records['/particles/atoms/position', 'write']['count'] == 15
+        assert records['/particles/atoms/velocity', 'write']['count'] == 5
+
+
+def test_stats_disabled(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        with pytest.raises(ValueError):
+            f.stats()
@@ -0,0 +1,79 @@
+import multiprocessing
+import time
+import pyh5md
+import numpy as np
+import pytest
+
+
+def write(fname, ready):
+    with pyh5md.File(fname, 'w', swmr=True, flush_interval=0.) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position',
+                             store='time', shape=(4,), dtype=np.float64,
+                             time=True, buffer_frames=3)
+        f.start_swmr()
+        ready.set()
+        for i in range(20):
+            pos.append(np.full(4, i), i, 0.5*i)
+            time.sleep(0.01)
+
+
+def write_frames(fname, ready, seen):
+    with pyh5md.File(fname, 'w', swmr=True, flush_interval=0.) as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4,),
+                             dtype=np.float64, time=True)
+        pyh5md.element(g, 'velocity', store='time', shape=(4,),
+                       dtype=np.float64, step_from=pos, time=True)
+        f.start_swmr()
+        ready.set()
+        for i in range(10):
+            g.append_frame(i, 0.5*i, position=np.full(4, i), velocity=np.full(4, -i))
+        # the frames must reach the reader before the file is closed
+        seen.wait(30)
+
+
+def test_follow_append_frame(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    context = multiprocessing.get_context('spawn')
+    ready, seen = context.Event(), context.Event()
+    writer = context.Process(target=write_frames, args=(fname, ready, seen))
+    writer.start()
+    assert ready.wait(30)
+    steps = []
+    with pyh5md.File(fname, 'r', swmr=True) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        for step, t, value in pos.follow(poll=0.01, timeout=5):
+            steps.extend(step)
+            if len(steps) == 10:
+                break
+    seen.set()
+    writer.join()
+    assert steps == list(range(10))
+
+
+def test_follow(tmpdir):
+    fname = str(tmpdir.join('test.h5'))
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    writer = context.Process(target=write, args=(fname, ready))
+    writer.start()
+    assert ready.wait(30)
+    steps = []
+    with pyh5md.File(fname, 'r', swmr=True) as f:
+        pos = pyh5md.element(f.particles_group('atoms'), 'position')
+        for step, t, value in pos.follow(poll=0.01, timeout=5):
+            assert np.all(value[:, 0] == step)
+            assert np.allclose(t, 0.5*step)
+            steps.extend(step)
+            if len(steps) == 20:
+                break
+    writer.join()
+    assert steps == list(range(20))
+
+
+def test_swmr_growth(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), 'w', swmr=True) as f:
+        with pytest.raises(ValueError):
+            pyh5md.element(f, 'observables/e', store='time', shape=(),
+                           dtype=np.float64, growth=2)
+        assert 'observables/e' not in f
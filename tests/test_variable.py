@@ -0,0 +1,78 @@
+import pyh5md
+import numpy as np
+import pytest
+
+
+def _frames():
+    # particles enter and leave, with more particles than the capacity
+    ids = [np.arange(3), np.arange(1, 6), np.array([5, 2]), np.arange(10)]
+    return [(i, ids[i], ids[i][:, None] + np.zeros((1, 3)) + 0.5*i) for i in range(4)]
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'buffer_frames': 3}])
+def test_variable(tmpdir, kwargs):
+    fname = str(tmpdir.join('test.h5'))
+    with pyh5md.File(fname, mode='w') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(4, 3),
+                             dtype=np.float64, time=True, variable=True, **kwargs)
+        pyh5md.element(g, 'id', store='time', shape=(4,), dtype=int,
+                       step_from=pos, variable=True, **kwargs)
+        for step, ids, r in _frames():
+            g.append_frame(step, 0.1*step, position=r, id=ids)
+        assert pos.valid_particles(1).shape == (5, 3)
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        # the capacity doubles: 4, 8, 16
+        assert pos.value.shape == (4, 16, 3)
+        assert np.all(pos.count[:] == [3, 5, 2, 10])
+        assert np.all(pyh5md.element(g, 'id').count[:] == [3, 5, 2, 10])
+        assert np.isnan(pos.value[0, 3:]).all()
+        assert np.all(pyh5md.element(g, 'id').value[2, 2:] == -1)
+        frames = pos.valid_particles(slice(None))
+        for (step, ids, r), v in zip(_frames(), frames):
+            assert np.all(v == r)
+        r = pos.read_particles(ids=[2, 5])
+        assert np.all(r[:, 0, 0] == [2, 2.5, 3, 3.5])
+        assert np.isnan(r[0, 1]).all()
+        assert np.all(r[1:, 1, 0] == [5.5, 6, 6.5])
+
+
+@pytest.mark.parametrize('kwargs,file_kwargs', [({}, {}), ({'buffer_frames': 2}, {}),
+                                                ({}, {'writer': 'async'})])
+def test_variable_fill_values(tmpdir, kwargs, file_kwargs):
+    # particles whose values equal the fill value are counted
+    fname = str(tmpdir.join('test.h5'))
+    r = np.array([[0., 1.], [np.nan, np.nan], [2., 3.]])
+    with pyh5md.File(fname, mode='w', **file_kwargs) as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position', store='time', shape=(2, 2),
+                             dtype=np.float64, variable=True, **kwargs)
+        pyh5md.element(g, 'id', store='time', shape=(2,), dtype=int,
+                       step_from=pos, variable=True, **kwargs)
+        g.append_frame(0, position=r, id=[4, -1, 7])
+        g.append_frame(1, position=r[1:], id=[-1, 3])
+        g.append_frame(2, position=r[:1], id=[5])
+
+    with pyh5md.File(fname, 'r') as f:
+        g = f.particles_group('atoms')
+        pos = pyh5md.element(g, 'position')
+        assert np.all(pos.count[:] == [3, 2, 1])
+        assert np.all(pyh5md.element(g, 'id').count[:] == [3, 2, 1])
+        v = pos.valid_particles(0)
+        assert v.shape == (3, 2)
+        assert np.isnan(v[1]).all() and np.all(v[2] == [2, 3])
+        assert np.all(pyh5md.element(g, 'id').valid_particles(1) == [-1, 3])
+
+
+def test_variable_errors(tmpdir):
+    with pyh5md.File(str(tmpdir.join('test.h5')), mode='w') as f:
+        with pytest.raises(ValueError):
+            pyh5md.element(f, 'observables/x', store='linear', shape=(4,),
+                           dtype=np.float64, step=1, variable=True)
+        x = pyh5md.element(f, 'observables/y', store='time', shape=(4,),
+                           dtype=np.float64)
+        with pytest.raises(ValueError):
+            x.valid_particles(0)